@@ -0,0 +1,59 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from foodgram.settings import ASGI_VIEW_THREADS
+
+# Свой пул: синхронные view Django под ASGI по умолчанию выполняются
+# в одном общем потоке (thread_sensitive=True) и идут строго по очереди.
+executor = ThreadPoolExecutor(
+    max_workers=ASGI_VIEW_THREADS, thread_name_prefix='asgi-view')
+
+
+def run_view(view, request, *args, **kwargs):
+    """Выполняет view и рендер ответа в потоке пула.
+
+    Сигналы request_started/request_finished закрывают соединения с
+    базой только в потоке обработчика, поэтому соединение потока пула
+    проверяется здесь же, до и после запроса.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            # Иначе Django отрендерит ответ DRF снова в общем потоке.
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Async-обёртка синхронного view для ASGI."""
+    call = sync_to_async(run_view, thread_sensitive=False, executor=executor)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await call(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_routes(urlpatterns, viewsets):
+    """Заменяет маршруты list и detail у viewsets на async-view."""
+    patterns = []
+    for pattern in urlpatterns:
+        callback = pattern.callback
+        actions = getattr(callback, 'actions', {})
+        if (
+            getattr(callback, 'cls', None) in viewsets
+            and actions.get('get') in ('list', 'retrieve')
+        ):
+            pattern = URLPattern(
+                pattern.pattern, async_view(callback),
+                pattern.default_args, pattern.name)
+        patterns.append(pattern)
+    return patterns
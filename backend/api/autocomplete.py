@@ -0,0 +1,107 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.db.models import Case, IntegerField, Value, When
+
+from foodgram.settings import (INGREDIENT_AUTOCOMPLETE_LIMIT,
+                               INGREDIENT_CACHE_MAX_SIZE,
+                               INGREDIENT_CACHE_TIMEOUT)
+from recipes.models import Ingredient
+
+from .cache import get_version
+
+EXACT, PREFIX, SUBSTRING = range(3)
+
+
+class IngredientIndex:
+    """Отсортированный по названию массив ингредиентов в памяти."""
+
+    def __init__(self, ingredients):
+        ingredients = sorted(
+            ingredients, key=lambda item: (item['name'].lower(), item['id']))
+        self.keys = [item['name'].lower() for item in ingredients]
+        self.items = ingredients
+
+    def search(self, query, limit):
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\uffff', start)
+        results = self.items[start:min(end, start + limit)]
+        if len(results) < limit:
+            for position, key in enumerate(self.keys):
+                if start <= position < end or query not in key:
+                    continue
+                results.append(self.items[position])
+                if len(results) == limit:
+                    break
+        return results
+
+
+class IngredientAutocomplete:
+    """Поиск ингредиентов: точное совпадение, начало, подстрока.
+
+    Если справочник не больше INGREDIENT_CACHE_MAX_SIZE, поиск идёт по
+    индексу в памяти процесса. Индекс пересобирается при смене версии
+    'ingredients' (сигналы Ingredient) или по истечении таймаута.
+    """
+
+    namespace = 'ingredients'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._built_at = 0
+
+    def is_fresh(self, version):
+        return (
+            self._version == version
+            and time.monotonic() - self._built_at < INGREDIENT_CACHE_TIMEOUT
+        )
+
+    def get_index(self):
+        version = get_version(self.namespace)
+        if not self.is_fresh(version):
+            with self._lock:
+                if not self.is_fresh(version):
+                    self._index = self.build_index()
+                    self._version = version
+                    self._built_at = time.monotonic()
+        return self._index
+
+    @staticmethod
+    def build_index():
+        ingredients = list(
+            Ingredient.objects.order_by().values(
+                'id', 'name', 'measurement_unit'
+            )[:INGREDIENT_CACHE_MAX_SIZE + 1]
+        )
+        if len(ingredients) > INGREDIENT_CACHE_MAX_SIZE:
+            return None
+        return IngredientIndex(ingredients)
+
+    @staticmethod
+    def search_database(query, limit):
+        return list(
+            Ingredient.objects.filter(name__icontains=query).annotate(
+                rank=Case(
+                    When(name__iexact=query, then=Value(EXACT)),
+                    When(name__istartswith=query, then=Value(PREFIX)),
+                    default=Value(SUBSTRING),
+                    output_field=IntegerField(),
+                )
+            ).order_by('rank', 'name').values(
+                'id', 'name', 'measurement_unit')[:limit]
+        )
+
+    def search(self, query, limit=INGREDIENT_AUTOCOMPLETE_LIMIT):
+        query = query.strip().lower()
+        if not query:
+            return []
+        index = self.get_index()
+        if index is None:
+            return self.search_database(query, limit)
+        return index.search(query, limit)
+
+
+ingredient_autocomplete = IngredientAutocomplete()
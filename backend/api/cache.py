@@ -0,0 +1,185 @@
+import hashlib
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.replicas import pin_primary, uses_replicas
+from foodgram.settings import (LOCAL_CACHE_VERSION_TIMEOUT, REPLICA_MAX_LAG,
+                               RESPONSE_CACHE_TIMEOUT)
+
+VERSION_KEY = 'version:{}'
+# Есть, пока реплики могут не успеть получить изменение пространства.
+CHANGED_KEY = 'changed:{}'
+
+
+def _initial_version():
+    # Версия из времени не повторяет старые значения после вытеснения ключа.
+    return int(time.time() * 1000)
+
+
+def shared_cache():
+    """Кеш общий для всех процессов, например Redis.
+
+    В LocMemCache версию, увеличенную командой импорта или другим
+    воркером, этот процесс не увидит.
+    """
+    return not isinstance(
+        caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _version_timeout():
+    # В кеше процесса версии живут недолго: чужое изменение станет видно
+    # не позже чем через LOCAL_CACHE_VERSION_TIMEOUT секунд.
+    return None if shared_cache() else LOCAL_CACHE_VERSION_TIMEOUT
+
+
+def _load_version(namespace):
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=_version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def get_version(namespace):
+    return get_versions(namespace)[0]
+
+
+def get_versions(*namespaces):
+    """Версии пространств одним обращением к кешу.
+
+    Если пространство недавно менялось, запрос дальше читает с основной
+    базы: иначе ответ или индекс со старыми данными реплики сохранится
+    под новой версией.
+    """
+    keys = {VERSION_KEY.format(namespace): namespace
+            for namespace in namespaces}
+    changed = (
+        [CHANGED_KEY.format(namespace) for namespace in namespaces]
+        if uses_replicas() else [])
+    versions = cache.get_many([*keys, *changed])
+    if any(key in versions for key in changed):
+        pin_primary()
+    return tuple(
+        versions[key] if key in versions else _load_version(namespace)
+        for key, namespace in keys.items()
+    )
+
+
+def make_etag(*parts):
+    return '"{}"'.format(
+        hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest())
+
+
+def bump_version(namespace):
+    if uses_replicas():
+        cache.set(CHANGED_KEY.format(namespace), 1, REPLICA_MAX_LAG)
+    key = VERSION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=_version_timeout())
+        return version
+
+
+class VersionedResponseCacheMixin:
+    """Кеширует готовый JSON ответов list/retrieve справочников.
+
+    Ключ содержит версию пространства cache_namespace, которую сигналы
+    увеличивают при изменении данных, поэтому старые ответы не удаляются,
+    а просто перестают читаться. ETag строится из той же версии, и
+    повторный запрос с If-None-Match получает 304 без обращения к кешу.
+    Ответы кешируются только в общем кеше (shared_cache), иначе процесс
+    отдавал бы их сутки после изменения данных в другом процессе.
+    """
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, view, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return view(request, *args, **kwargs)
+        version = get_version(self.cache_namespace)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        etag = f'"{self.cache_namespace}-{version}-{path}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+            return response
+        if not shared_cache():
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = etag
+            return response
+        key = f'response:{self.cache_namespace}:{version}:{path}'
+        content = cache.get(key)
+        if content is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = renderer.render(
+                response.data, renderer.media_type,
+                self.get_renderer_context())
+            cache.set(key, content, timeout=RESPONSE_CACHE_TIMEOUT)
+        response = HttpResponse(content, content_type=renderer.media_type)
+        response['ETag'] = etag
+        return response
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы для list и retrieve.
+
+    Валидаторы (ETag и время изменения) считаются методами
+    get_list_validators и get_object_validators без сериализации, поэтому
+    совпавший If-None-Match сразу получает 304.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_validators(), super().list,
+            request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_object_validators(), super().retrieve,
+            request, *args, **kwargs)
+
+    def get_list_validators(self):
+        return None, None
+
+    def get_object_validators(self):
+        return None, None
+
+    def conditional_response(self, validators, view, request, *args,
+                             **kwargs):
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,92 @@
+from concurrent.futures import TimeoutError as PoolTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, ValidationError
+
+from recipes.images import InvalidImage, save_base64_image
+
+
+def build_url(request, name):
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+class ImageProcessingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Обработка изображений временно недоступна.'
+    default_code = 'image_processing_unavailable'
+
+
+class StoredImage(str):
+    """Имя сохранённого файла вместе с описанием его копий."""
+
+    def __new__(cls, name, variants):
+        value = super().__new__(cls, name)
+        value.variants = variants
+        return value
+
+
+class ProcessedImageField(Base64ImageField):
+    """Base64-изображение, обработанное в пуле процессов.
+
+    В модель попадает имя файла из хеша содержимого, описание копий
+    доступно в атрибуте variants результата. В списках вместо оригинала
+    отдаётся копия шириной list_width из поля модели variants_field.
+    """
+
+    def __init__(self, *args, upload_to, list_width=None,
+                 variants_field=None, **kwargs):
+        self.upload_to = upload_to
+        self.list_width = list_width
+        self.variants_field = variants_field
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if ';base64,' in base64_data:
+            base64_data = base64_data.split(';base64,', 1)[1]
+        try:
+            return StoredImage(
+                *save_base64_image(base64_data, self.upload_to))
+        except (InvalidImage, PoolTimeoutError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        except BrokenProcessPool:
+            raise ImageProcessingUnavailable
+
+    def to_representation(self, file):
+        view = self.context.get('view')
+        variant = None
+        if file and self.list_width and getattr(view, 'action', None) == (
+            'list'
+        ):
+            variants = getattr(file.instance, self.variants_field, None)
+            variant = (variants or {}).get(str(self.list_width))
+        if variant is None:
+            return super().to_representation(file)
+        return build_url(self.context.get('request'), variant['name'])
+
+
+class ImageVariantsField(serializers.Field):
+    """Копии изображения в духе srcset: {'320w': {url, width, height}}."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        return {
+            f'{width}w': {
+                'url': build_url(request, variant['name']),
+                'width': variant['width'],
+                'height': variant['height'],
+            }
+            for width, variant in sorted(
+                (variants or {}).items(), key=lambda item: int(item[0]))
+        }
@@ -1,13 +1,14 @@
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
 from recipes.models import MyUser, Recipe, Tag
+from recipes.search import search_recipes
 
-
-class IngredientFilter(SearchFilter):
-    """Фильтрация ингредиентов по названию при поиске."""
-
-    search_param = 'name'
+# Каждый порядок заканчивается id, чтобы по нему работал курсор.
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'quick': ('cooking_time', '-id'),
+}
 
 
 class RecipeFilter(FilterSet):
@@ -20,10 +21,16 @@ class RecipeFilter(FilterSet):
         to_field_name='slug',)
     is_favorited = filters.BooleanFilter(method='filter_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering',)
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering',)
 
     def filter_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -34,3 +41,10 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(cart_recipe__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        # Порядок по релевантности, если не задан ?ordering.
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
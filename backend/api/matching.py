@@ -0,0 +1,226 @@
+import threading
+from array import array
+from collections import defaultdict, namedtuple
+
+from foodgram.settings import EXPORT_CHUNK_SIZE
+from recipes.models import IngredientRecipe
+
+from .cache import get_versions
+
+ALL, MISSING, JACCARD = 'all', 'missing', 'jaccard'
+MATCH_MODES = (ALL, MISSING, JACCARD)
+
+Match = namedtuple('Match', ('recipe_id', 'matched', 'missing', 'score'))
+
+
+def popcount(bits):
+    return bits.bit_count()
+
+
+if not hasattr(int, 'bit_count'):
+    # int.bit_count() появился только в Python 3.10.
+    def popcount(bits):  # noqa: F811
+        return bin(bits).count('1')
+
+
+def to_bitset(positions, size):
+    bitmap = bytearray((size + 7) // 8)
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def iter_bits(bits):
+    """Номера установленных битов от старшего к младшему."""
+    while bits:
+        position = bits.bit_length() - 1
+        yield position
+        bits ^= 1 << position
+
+
+class RecipeMatches:
+    """Найденные рецепты, сгруппированные по (совпало, размер рецепта).
+
+    Группы уже отсортированы, внутри группы рецепты идут по убыванию id.
+    Поддерживает len() и срезы, поэтому годится для LimitOffsetPagination:
+    id рецептов извлекаются только для запрошенной страницы.
+    """
+
+    def __init__(self, recipe_ids, groups):
+        self.recipe_ids = recipe_ids
+        self.groups = groups
+        self._sizes = None
+
+    @property
+    def sizes(self):
+        if self._sizes is None:
+            self._sizes = [popcount(bits) for *_, bits in self.groups]
+        return self._sizes
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('RecipeMatches поддерживает только срезы.')
+        start, stop, _ = item.indices(len(self))
+        wanted = stop - start
+        results = []
+        for (matched, missing, score, bits), size in zip(
+            self.groups, self.sizes
+        ):
+            if len(results) >= wanted:
+                break
+            if start >= size:
+                start -= size
+                continue
+            for position in iter_bits(bits):
+                if start:
+                    start -= 1
+                    continue
+                results.append(Match(
+                    self.recipe_ids[position], matched, missing, score))
+                if len(results) == wanted:
+                    break
+        return results
+
+
+class RecipeIngredientIndex:
+    """Индекс «рецепт → множество ингредиентов» на битовых множествах.
+
+    Рецепты пронумерованы по возрастанию id. Для каждого ингредиента
+    хранится int, в котором установлены биты его рецептов, для каждого
+    размера рецепта — биты рецептов с таким числом ингредиентов.
+    Число совпавших с запросом ингредиентов считается побитовым
+    сумматором (bit-sliced counter): j-й срез хранит j-й бит счётчика
+    всех рецептов сразу, поэтому запрос — это несколько сотен операций
+    над длинными int, а не проход по рецептам.
+    """
+
+    def __init__(self, links):
+        self.recipe_ids = array('q')
+        positions = defaultdict(list)
+        sizes = defaultdict(list)
+        current, size = None, 0
+        for recipe_id, ingredient_id in links:
+            if recipe_id != current:
+                if current is not None:
+                    sizes[size].append(len(self.recipe_ids) - 1)
+                self.recipe_ids.append(recipe_id)
+                current, size = recipe_id, 0
+            positions[ingredient_id].append(len(self.recipe_ids) - 1)
+            size += 1
+        if current is not None:
+            sizes[size].append(len(self.recipe_ids) - 1)
+        total = len(self.recipe_ids)
+        self.postings = {
+            ingredient_id: to_bitset(items, total)
+            for ingredient_id, items in positions.items()
+        }
+        self.by_size = {
+            size: to_bitset(items, total)
+            for size, items in sorted(sizes.items())
+        }
+        self.universe = (1 << total) - 1
+
+    def count_matches(self, ingredient_ids):
+        slices = []
+        for ingredient_id in ingredient_ids:
+            carry = self.postings.get(ingredient_id, 0)
+            for position, bits in enumerate(slices):
+                if not carry:
+                    break
+                slices[position] = bits ^ carry
+                carry &= bits
+            if carry:
+                slices.append(carry)
+        return slices
+
+    def with_count(self, slices, count):
+        if count >> len(slices):
+            return 0
+        bits = self.universe
+        for position, slice_bits in enumerate(slices):
+            if count >> position & 1:
+                bits &= slice_bits
+            else:
+                bits &= ~slice_bits
+        return bits
+
+    def match(self, ingredient_ids, mode=ALL, missing=0):
+        """Рецепты, в которых есть хотя бы один ингредиент из запроса.
+
+        all — есть все ингредиенты рецепта, missing — не хватает не больше
+        missing, jaccard — любые пересечения по убыванию коэффициента
+        Жаккара. В первых двух режимах сначала идут рецепты, которым
+        меньше не хватает.
+        """
+        ingredient_ids = set(ingredient_ids)
+        if mode == ALL:
+            missing = 0
+        slices = self.count_matches(ingredient_ids)
+        groups = []
+        for matched in range(1, len(ingredient_ids) + 1):
+            with_matched = self.with_count(slices, matched)
+            if not with_matched:
+                continue
+            for size, recipes in self.by_size.items():
+                lacking = size - matched
+                if lacking < 0 or (mode != JACCARD and lacking > missing):
+                    continue
+                bits = with_matched & recipes
+                if bits:
+                    score = matched / (size + len(ingredient_ids) - matched)
+                    groups.append((matched, lacking, round(score, 4), bits))
+        if mode == JACCARD:
+            groups.sort(key=lambda group: (-group[2], group[1]))
+        else:
+            groups.sort(key=lambda group: (group[1], -group[2]))
+        return RecipeMatches(self.recipe_ids, groups)
+
+
+class RecipeMatcher:
+    """Поиск рецептов по имеющимся ингредиентам.
+
+    Индекс строится в памяти процесса и пересобирается при смене версий
+    'recipes' и 'recipe_ingredients' (сигналы IngredientRecipe и
+    сериализатор рецептов). Пока один поток пересобирает индекс,
+    остальные отвечают по предыдущему.
+    """
+
+    namespaces = ('recipes', 'recipe_ingredients')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def get_index(self):
+        version = get_versions(*self.namespaces)
+        if self._version == version:
+            return self._index
+        if not self._lock.acquire(blocking=self._index is None):
+            return self._index
+        try:
+            if self._version != version:
+                self._index = self.build_index()
+                self._version = version
+        finally:
+            self._lock.release()
+        return self._index
+
+    @staticmethod
+    def build_index():
+        return RecipeIngredientIndex(
+            IngredientRecipe.objects.order_by(
+                'recipe_id', 'ingredient_id'
+            ).values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+    def match(self, ingredient_ids, mode=ALL, missing=0):
+        return self.get_index().match(ingredient_ids, mode, missing)
+
+
+recipe_matcher = RecipeMatcher()
@@ -1,7 +1,216 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomHomePagination(PageNumberPagination):
     """Пагинация рецептов. 6 штук на старнице."""
 
     page_size_query_param = 'limit'
+
+
+class RecipeMatchPagination(LimitOffsetPagination):
+    """Пагинация подбора рецептов по ингредиентам: limit и offset."""
+
+    max_limit = 100
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL без COUNT(*)."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.get_compiler(
+        using=queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (курсору) вместо OFFSET.
+
+    Страница выбирается условием на поля ordering последней строки
+    предыдущей страницы, поэтому дальняя страница стоит столько же,
+    сколько первая. Число записей не считается, пока не передан
+    ?count=approx (оценка по плану запроса) или ?count=exact. Явный
+    order_by запроса (например, из фильтра) заменяет ordering, если он
+    заканчивается уникальным id.
+    """
+
+    ordering = ('-pub_date', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+        self.ordering = self.get_ordering(queryset)
+        values, self.reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.seek(ordering, values))
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+        self.has_next = self.has_more if not self.reverse else True
+        self.has_previous = (
+            self.has_more if self.reverse else values is not None)
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by)
+        if ordering and ordering[-1].lstrip('-') in ('id', 'pk'):
+            return ordering
+        return self.ordering
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def seek(ordering, values):
+        """Условие «строго после values» для заданного порядка.
+
+        Первое поле дополнительно ограничено нестрогим неравенством: так
+        PostgreSQL читает составной индекс как диапазон.
+        """
+        fields = [
+            (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt')
+            for field in ordering
+        ]
+        condition = Q()
+        equal = Q()
+        for (name, operator), value in zip(fields, values):
+            condition |= equal & Q(**{f'{name}__{operator}': value})
+            equal &= Q(**{name: value})
+        name, operator = fields[0]
+        return Q(**{f'{name}__{operator}e': values[0]}) & condition
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(token.encode()))
+            if len(data['v']) != len(self.ordering):
+                raise ValueError
+            values = [
+                self.parse_value(model, field.lstrip('-'), value)
+                for field, value in zip(self.ordering, data['v'])
+            ]
+            return values, bool(data.get('r'))
+        except (BinasciiError, ValueError, TypeError, KeyError,
+                DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def parse_value(model, name, value):
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            # Аннотации (например, rank поиска) приходят числами.
+            if not isinstance(value, (int, float)):
+                raise ValueError
+            return value
+
+    def encode_cursor(self, instance, reverse=False):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value)
+        data = {'v': values}
+        if reverse:
+            data['r'] = 1
+        token = urlsafe_b64encode(json.dumps(data).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+    """Курсор по ленте подписок, только вперёд.
+
+    Лента сливается из двух выборок (см. recipes.feeds), поэтому
+    страницу отдаёт функция get_page(after, limit), а не фильтр queryset.
+    """
+
+    def paginate_feed(self, get_page, request, model):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        values, reverse = self.decode_cursor(request, model)
+        if reverse:
+            raise NotFound(self.invalid_cursor_message)
+        results = get_page(values, self.page_size + 1)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_previous_link(self):
+        return None
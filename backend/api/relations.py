@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from foodgram.settings import USER_RELATIONS_CACHE_TIMEOUT
+from recipes.models import FavoriteRecipe, ShoppingCart, SubscriptionUser
+
+from .cache import get_version
+
+FAVORITES, CART, SUBSCRIPTIONS = range(3)
+
+
+class UserRelations:
+    """Избранное, корзина и подписки пользователя в виде множеств id.
+
+    id хранятся в отсортированных массивах array('q'), проверка
+    принадлежности идёт бинарным поиском без обращений к базе.
+    """
+
+    def __init__(self, favorites=(), cart=(), subscriptions=()):
+        self.sets = tuple(
+            array('q', sorted(ids))
+            for ids in (favorites, cart, subscriptions)
+        )
+
+    @staticmethod
+    def contains(ids, value):
+        position = bisect_left(ids, value)
+        return position < len(ids) and ids[position] == value
+
+    def is_favorited(self, recipe_id):
+        return self.contains(self.sets[FAVORITES], recipe_id)
+
+    def is_in_shopping_cart(self, recipe_id):
+        return self.contains(self.sets[CART], recipe_id)
+
+    def is_subscribed(self, author_id):
+        return self.contains(self.sets[SUBSCRIPTIONS], author_id)
+
+    def dumps(self):
+        return tuple(ids.tobytes() for ids in self.sets)
+
+    @classmethod
+    def loads(cls, data):
+        relations = cls()
+        relations.sets = tuple(array('q', chunk) for chunk in data)
+        return relations
+
+    @classmethod
+    def from_database(cls, user):
+        ids = ([], [], [])
+        rows = FavoriteRecipe.objects.filter(user=user).annotate(
+            kind=Value(FAVORITES, output_field=IntegerField())
+        ).values_list('kind', 'recipe_id').union(
+            ShoppingCart.objects.filter(user=user).annotate(
+                kind=Value(CART, output_field=IntegerField())
+            ).values_list('kind', 'recipe_id'),
+            SubscriptionUser.objects.filter(user=user).annotate(
+                kind=Value(SUBSCRIPTIONS, output_field=IntegerField())
+            ).values_list('kind', 'author_id'),
+            all=True,
+        )
+        for kind, object_id in rows:
+            ids[kind].append(object_id)
+        return cls(*ids)
+
+    @classmethod
+    def load(cls, user):
+        if not user.is_authenticated:
+            return cls()
+        if not USER_RELATIONS_CACHE_TIMEOUT:
+            return cls.from_database(user)
+        namespace = f'relations:{user.id}'
+        key = f'{namespace}:{get_version(namespace)}'
+        data = cache.get(key)
+        if data is not None:
+            return cls.loads(data)
+        relations = cls.from_database(user)
+        cache.set(key, relations.dumps(), USER_RELATIONS_CACHE_TIMEOUT)
+        return relations
+
+
+def get_user_relations(request):
+    """Связи пользователя, загруженные один раз на запрос."""
+    if request is None:
+        return UserRelations()
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations.load(request.user)
+        request._user_relations = relations
+    return relations
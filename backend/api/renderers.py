@@ -0,0 +1,163 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 11
+PDF_LEADING = 14
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_ENCODING = 'cp1251'
+# Имена глифов кириллицы для позиций cp1251: Ё, ё и А-я.
+PDF_CYRILLIC_GLYPHS = (
+    '168 /afii10023 184 /afii10071 192 '
+    + ' '.join(
+        f'/afii{code}'
+        for code in (*range(10017, 10023), *range(10024, 10050),
+                     *range(10065, 10071), *range(10072, 10098))
+    )
+)
+
+
+class CartRenderer(BaseRenderer):
+    """Базовый класс выгрузки списка покупок."""
+
+    charset = 'utf-8'
+    title = 'Список покупок'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = [f'{key}: {value}' for key, value in data.items()]
+        return '\n'.join(str(line) for line in data).encode(
+            self.charset or 'utf-8')
+
+    @staticmethod
+    def format_line(name, measurement_unit, amount):
+        return f'{name} - {amount} ({measurement_unit})'
+
+    def export(self, rows):
+        raise NotImplementedError
+
+
+class PlainTextCartRenderer(CartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def export(self, rows):
+        for name, measurement_unit, amount in rows:
+            yield (
+                self.format_line(name, measurement_unit, amount) + '\n'
+            ).encode(self.charset)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVCartRenderer(CartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def export(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(
+            ('name', 'amount', 'measurement_unit')).encode(self.charset)
+        for name, measurement_unit, amount in rows:
+            yield writer.writerow(
+                (name, amount, measurement_unit)).encode(self.charset)
+
+
+class PDFCartRenderer(CartRenderer):
+    """Потоковая выгрузка в PDF: страницы отдаются по мере чтения строк."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def export(self, rows):
+        offsets = {}
+        written = 0
+        page_ids = []
+        next_id = 6
+
+        def write_object(object_id, body):
+            nonlocal written
+            offsets[object_id] = written
+            chunk = f'{object_id} 0 obj\n'.encode() + body + b'\nendobj\n'
+            written += len(chunk)
+            return chunk
+
+        def write_page(lines):
+            nonlocal next_id
+            content_id, page_id = next_id, next_id + 1
+            next_id += 2
+            page_ids.append(page_id)
+            text = b'\n'.join(b'(%s) Tj T*' % self.escape(line)
+                              for line in lines)
+            stream = (
+                b'BT /F1 %d Tf %d TL %d %d Td\n%s\nET' % (
+                    PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN,
+                    PDF_PAGE_HEIGHT - PDF_MARGIN, text)
+            )
+            return write_object(
+                content_id,
+                b'<< /Length %d >>\nstream\n%s\nendstream' % (
+                    len(stream), stream),
+            ) + write_object(
+                page_id,
+                b'<< /Type /Page /Parent 2 0 R /Contents %d 0 R '
+                b'/Resources << /Font << /F1 3 0 R >> >> >>' % content_id,
+            )
+
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        written = len(header)
+        yield header + write_object(
+            1, b'<< /Type /Catalog /Pages 2 0 R >>'
+        ) + write_object(
+            3, b'<< /Type /Font /Subtype /TrueType /BaseFont /CourierNew '
+               b'/FirstChar 32 /LastChar 255 /Widths [%s] '
+               b'/FontDescriptor 5 0 R /Encoding 4 0 R >>' % (
+                   b' '.join([b'600'] * 224))
+        ) + write_object(
+            4, b'<< /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+               b'/Differences [%s] >>' % PDF_CYRILLIC_GLYPHS.encode()
+        ) + write_object(
+            5, b'<< /Type /FontDescriptor /FontName /CourierNew /Flags 35 '
+               b'/FontBBox [-21 -680 638 1021] /ItalicAngle 0 '
+               b'/Ascent 833 /Descent -300 /CapHeight 571 /StemV 109 >>'
+        )
+
+        lines = [self.title, '']
+        for name, measurement_unit, amount in rows:
+            lines.append(self.format_line(name, measurement_unit, amount))
+            if len(lines) == PDF_LINES_PER_PAGE:
+                yield write_page(lines)
+                lines = []
+        if lines or not page_ids:
+            yield write_page(lines)
+
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+        pages = write_object(
+            2, b'<< /Type /Pages /Kids [%s] /Count %d /MediaBox '
+               b'[0 0 %d %d] >>' % (
+                   kids, len(page_ids), PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT)
+        )
+        xref_offset = written
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % next_id]
+        xref.extend(
+            b'%010d 00000 n \n' % offsets[object_id]
+            for object_id in range(1, next_id)
+        )
+        yield pages + b''.join(xref) + (
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (next_id, xref_offset)
+        )
+
+    @staticmethod
+    def escape(line):
+        return line.encode(PDF_ENCODING, errors='replace').replace(
+            b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
@@ -1,54 +1,67 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from foodgram.settings import MAX_VALUE_VALIDATOR, MIN_VALUE_VALIDATOR
+from foodgram.settings import (IMAGE_LIST_WIDTH, MAX_VALUE_VALIDATOR,
+                               MIN_VALUE_VALIDATOR,
+                               RECIPE_MATCH_MAX_INGREDIENTS)
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
                             MyUser, Recipe, ShoppingCart, SubscriptionUser,
-                            Tag)
+                            Tag, TagRecipe)
+from recipes.search import update_search_index
+from recipes.services import update_recipe_cart_totals
+
+from .cache import bump_version
+from .fields import ImageVariantsField, ProcessedImageField
+from .matching import ALL, MATCH_MODES
+from .relations import get_user_relations
+from .utils import get_recipes_limit
 
 
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для аватаров."""
 
-    avatar = Base64ImageField(required=False, allow_null=True)
+    avatar = ProcessedImageField(
+        upload_to='avatars', required=False, allow_null=True)
 
     class Meta:
         model = MyUser
         fields = ('avatar',)
 
+    def validate(self, data):
+        if 'avatar' in data:
+            data['avatar_variants'] = getattr(data['avatar'], 'variants', {})
+        return data
+
 
 class RecipeShortInfoSerializer(serializers.ModelSerializer):
     """Сериализатор для краткой информации о рецептах."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time',)
 
 
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField()
 
     class Meta:
         model = MyUser
         fields = (
-            'id', 'email', 'username', 'avatar',
+            'id', 'email', 'username', 'avatar', 'avatar_variants',
             'first_name', 'last_name', 'is_subscribed',
         )
         read_only_fields = ('avatar', 'is_subscribed',)
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None:
-            return False
-        user = request.user
-        return user.is_authenticated and SubscriptionUser.objects.filter(
-            user=user, author=obj
-        ).exists()
+        return get_user_relations(
+            self.context.get('request')).is_subscribed(obj.id)
 
 
 class UserGetSubscribeSerializer(serializers.ModelSerializer):
@@ -56,7 +69,6 @@ class UserGetSubscribeSerializer(serializers.ModelSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = MyUser
@@ -64,29 +76,27 @@ class UserGetSubscribeSerializer(serializers.ModelSerializer):
             'id', 'is_subscribed', 'recipes', 'recipes_count',
             'email', 'username', 'first_name', 'last_name',
         )
-        read_only_fields = ('email', 'username', 'first_name', 'last_name',)
+        read_only_fields = (
+            'email', 'username', 'first_name', 'last_name', 'recipes_count',)
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return SubscriptionUser.objects.filter(
-            user=request.user, author=obj).exists()
+        return get_user_relations(
+            self.context.get('request')).is_subscribed(obj.id)
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj)
-        if limit:
-            recipes = recipes[:int(limit)]
-        serializer = ReadOnlyRecipeSerializer(
-            recipes, context={"request": request}, many=True
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj)
+            limit = get_recipes_limit(request)
+            if limit is not None:
+                recipes = recipes[:limit]
+        serializer = RecipeShortInfoSerializer(
+            recipes, context={'request': request}, many=True
         )
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
 
 class UserPostDelSubscribeSerializer(serializers.ModelSerializer):
     """Сериализатор для удаления и создания подписки пользователя."""
@@ -175,7 +185,10 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Recipe."""
 
     author = UserSerializer(read_only=True,)
-    image = Base64ImageField()
+    image = ProcessedImageField(
+        upload_to='recipe_images', list_width=IMAGE_LIST_WIDTH,
+        variants_field='image_variants')
+    image_variants = ImageVariantsField()
     tags = TagSerializer(
         many=True, read_only=True,
     )
@@ -189,23 +202,39 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text', 'tags', 'ingredients',
-            'pub_date', 'cooking_time', 'is_favorited',
-            'is_in_shopping_cart',)
+            'id', 'author', 'name', 'image', 'image_variants', 'text',
+            'tags', 'ingredients', 'pub_date', 'cooking_time',
+            'is_favorited', 'is_in_shopping_cart',)
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and FavoriteRecipe.objects.filter(
-                user=request.user, recipe=obj).exists())
+        return get_user_relations(
+            self.context.get('request')).is_favorited(obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and ShoppingCart.objects.filter(
-                user=request.user, recipe=obj).exists())
+        return get_user_relations(
+            self.context.get('request')).is_in_shopping_cart(obj.id)
+
+
+class RecipeMatchQuerySerializer(serializers.Serializer):
+    """Параметры поиска рецептов по имеющимся ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=RECIPE_MATCH_MAX_INGREDIENTS,)
+    mode = serializers.ChoiceField(choices=MATCH_MODES, default=ALL)
+    missing = serializers.IntegerField(min_value=0, default=1)
+
+
+class RecipeMatchSerializer(ReadOnlyRecipeSerializer):
+    """Рецепт с числом совпавших и недостающих ингредиентов."""
+
+    matched = serializers.IntegerField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(ReadOnlyRecipeSerializer.Meta):
+        fields = ReadOnlyRecipeSerializer.Meta.fields + (
+            'matched', 'missing', 'score',)
 
 
 class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
@@ -215,10 +244,10 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
     ingredients = AddIngredientToRecipeSerializer(
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all(),
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
     )
-    image = Base64ImageField()
+    image = ProcessedImageField(upload_to='recipe_images')
     cooking_time = serializers.IntegerField(
         validators=(
             MinValueValidator(MIN_VALUE_VALIDATOR),
@@ -232,18 +261,100 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
             'id', 'author', 'ingredients', 'tags',
             'image', 'name', 'text', 'cooking_time',)
 
+    @staticmethod
+    def get_missing(model, ids):
+        ids = list(dict.fromkeys(ids))
+        found = model.objects.in_bulk(ids)
+        return found, [pk for pk in ids if pk not in found]
+
+    def validate_tags(self, tags):
+        if len(set(tags)) != len(tags):
+            raise serializers.ValidationError('Теги не должны повторяться.')
+        found, missing = self.get_missing(Tag, tags)
+        if missing:
+            raise serializers.ValidationError(
+                f'Несуществующие теги: {missing}.')
+        return [found[pk] for pk in tags]
+
+    def validate_ingredients(self, ingredients):
+        ids = [ingredient['id'] for ingredient in ingredients]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.')
+        found, missing = self.get_missing(Ingredient, ids)
+        if missing:
+            raise serializers.ValidationError(
+                f'Несуществующие ингредиенты: {missing}.')
+        return {pk: ingredient['amount']
+                for pk, ingredient in zip(ids, ingredients)}
+
+    def validate(self, data):
+        if 'name' in data:
+            recipes = Recipe.objects.filter(
+                author=self.context['request'].user, name=data['name'])
+            if self.instance is not None:
+                recipes = recipes.exclude(pk=self.instance.pk)
+            if recipes.exists():
+                raise serializers.ValidationError(
+                    {'name': 'У вас уже есть рецепт с таким названием.'})
+        if 'image' in data:
+            data['image_variants'] = data['image'].variants
+        return data
+
     @staticmethod
     def add_ingredients(recipe, tags, ingredients):
-        recipe.tags.set(tags)
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in tags)
         IngredientRecipe.objects.bulk_create(
             IngredientRecipe(
-                recipe=recipe,
-                ingredient=Ingredient.objects.get(id=ingredient.get('id')),
-                amount=ingredient.get('amount'),
-            )
-            for ingredient in ingredients
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in ingredients.items()
         )
 
+    @staticmethod
+    def update_tags(recipe, tags):
+        current = set(
+            TagRecipe.objects.filter(
+                recipe=recipe).values_list('tag_id', flat=True))
+        incoming = {tag.id for tag in tags}
+        if current - incoming:
+            TagRecipe.objects.filter(
+                recipe=recipe, tag__in=current - incoming).delete()
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag_id=tag_id)
+            for tag_id in incoming - current
+        )
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        current = {
+            item.ingredient_id: item
+            for item in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in current.items()
+        }
+        removed = current.keys() - ingredients.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient__in=removed).delete()
+        changed = []
+        for ingredient_id, amount in ingredients.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in ingredients.items()
+            if ingredient_id not in current
+        )
+        return old_amounts
+
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -252,22 +363,29 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
                 author=self.context['request'].user, **validated_data
             )
             self.add_ingredients(recipe, tags, ingredients)
+            update_search_index([recipe.id])
+            transaction.on_commit(
+                lambda: bump_version('recipe_ingredients'))
             return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        super().update(instance, validated_data)
-        self.add_ingredients(instance, tags, ingredients)
-        instance.save()
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            old_amounts = self.update_ingredients(instance, ingredients)
+            update_recipe_cart_totals(instance.id, old_amounts, ingredients)
+            transaction.on_commit(
+                lambda: bump_version('recipe_ingredients'))
+        instance = super().update(instance, validated_data)
+        update_search_index([instance.id])
         return instance
 
     def to_representation(self, instance):
         serializer = ReadOnlyRecipeSerializer(
-            instance,
+            Recipe.objects.with_relations().get(pk=instance.pk),
             context={'request': self.context.get('request')}
         )
         return serializer.data
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
+                            MyUser, Recipe, ShoppingCart, SubscriptionUser,
+                            Tag)
+
+from .cache import bump_version
+
+# Версии меняются после коммита. Иначе чтение между сигналом и коммитом
+# сохранило бы в кеше старые данные уже под новой версией, а индекс
+# ингредиентов пересобрался бы без новых связей.
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('ingredients'))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('tags'))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipes(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def invalidate_recipe_ingredients(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('recipe_ingredients'))
+
+
+@receiver((post_save, post_delete), sender=MyUser)
+def invalidate_users(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_version('users'))
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+def invalidate_popularity(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('popularity'))
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=SubscriptionUser)
+def invalidate_user_relations(sender, instance, **kwargs):
+    namespace = f'relations:{instance.user_id}'
+    transaction.on_commit(lambda: bump_version(namespace))
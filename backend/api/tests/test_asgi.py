@@ -0,0 +1,108 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from foodgram.asgi import application
+from foodgram.streaming import iterate_in_thread
+from recipes.models import (Ingredient, IngredientRecipe, MyUser, Recipe,
+                            ShoppingCart)
+
+
+class AsgiDownloadTests(TransactionTestCase):
+    """Выгрузка списка покупок через ASGI-приложение.
+
+    TransactionTestCase: view работает в другом потоке и соединении с
+    базой и не видит данных незафиксированной транзакции TestCase.
+    """
+
+    def setUp(self):
+        self.user = user = MyUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Покупатель', last_name='Покупатель', password='pass')
+        self.token = Token.objects.create(user=user)
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipe_images/test.png')
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=salt, amount=10)
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    async def download(self, extension):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/api/recipes/download_shopping_cart/',
+            'query_string': f'format={extension}'.encode(),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+            'server': ('testserver', 80),
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(timeout=10)
+        body = b''
+        while True:
+            message = await communicator.receive_output(timeout=10)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        await communicator.wait()
+        return start['status'], body
+
+    def test_download(self):
+        for extension, expected in (
+            ('txt', 'Соль - 10 (г)'.encode()),
+            ('csv', 'Соль,10,г'.encode()),
+            ('pdf', b'%PDF'),
+        ):
+            with self.subTest(extension=extension):
+                status, body = async_to_sync(self.download)(extension)
+                self.assertEqual(status, 200)
+                self.assertIn(expected, body)
+
+    @mock.patch('api.views.EXPORT_CHUNK_SIZE', 2)
+    @mock.patch('api.utils.EXPORT_CHUNK_SIZE', 2)
+    def test_download_in_batches(self):
+        for number in range(5):
+            ingredient = Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            recipe = Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipe_images/test.png')
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=number + 1)
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        status, body = async_to_sync(self.download)('txt')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body.decode().splitlines()), 6)
+        self.assertIn('Ингредиент 4 - 5 (г)'.encode(), body)
+
+
+class IterateInThreadTests(SimpleTestCase):
+    """Из синхронного итератора за раз читается не больше одной пачки."""
+
+    def test_batches(self):
+        consumed = []
+
+        def items():
+            for number in range(5):
+                consumed.append(number)
+                yield number
+
+        async def first_items():
+            result = []
+            async for item in iterate_in_thread(items(), 2):
+                result.append((item, len(consumed)))
+            return result
+
+        self.assertEqual(
+            async_to_sync(first_items)(),
+            [(0, 2), (1, 2), (2, 4), (3, 4), (4, 5)])
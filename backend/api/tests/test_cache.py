@@ -0,0 +1,80 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.cache import get_version
+from foodgram.settings import LOCAL_CACHE_VERSION_TIMEOUT
+from recipes.models import FavoriteRecipe, MyUser, Recipe, Tag
+
+
+class VersionBumpTests(TestCase):
+    """Версия пространства меняется только после коммита."""
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_bumped_on_commit(self, namespace, write):
+        before = get_version(namespace)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+            self.assertEqual(get_version(namespace), before)
+        self.assertNotEqual(get_version(namespace), before)
+
+    def test_tags(self):
+        self.assert_bumped_on_commit(
+            'tags', lambda: Tag.objects.create(name='Ужин', slug='dinner'))
+
+    def test_user_relations(self):
+        user = MyUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читатель', password='pass')
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipe_images/test.png')
+        self.assert_bumped_on_commit(
+            f'relations:{user.pk}',
+            lambda: FavoriteRecipe.objects.create(user=user, recipe=recipe))
+
+
+class ResponseCacheBackendTests(TestCase):
+    """Ответы кешируются только в кеше, общем для всех процессов.
+
+    Tag.objects.update не вызывает сигналов, как изменение из другого
+    процесса, версия которого до кеша процесса не доходит.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.tag = Tag.objects.create(name='Ужин', slug='dinner')
+
+    def tag_name_after_update(self):
+        client = APIClient()
+        first = client.get(f'/api/tags/{self.tag.pk}/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        Tag.objects.filter(pk=self.tag.pk).update(name='Обед')
+        return client.get(f'/api/tags/{self.tag.pk}/').json()['name']
+
+    def test_local_cache_does_not_cache_responses(self):
+        self.assertEqual(self.tag_name_after_update(), 'Обед')
+
+    def test_shared_cache_caches_responses(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'),
+                'LOCATION': location,
+            }}):
+                self.assertEqual(self.tag_name_after_update(), 'Ужин')
+
+    def test_local_versions_expire(self):
+        now = 1_700_000_000.0
+        with mock.patch('time.time', return_value=now):
+            version = get_version('tags')
+        with mock.patch(
+            'time.time', return_value=now + LOCAL_CACHE_VERSION_TIMEOUT + 1
+        ):
+            self.assertNotEqual(get_version('tags'), version)
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from recipes.models import MyUser, Recipe, Tag
+
+
+class RecipeConditionalGetTests(TestCase):
+    """Условные GET рецепта опираются только на ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = MyUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Автор', password='pass')
+        cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipe_images/test.png')
+        cls.recipe.tags.set([cls.tag])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.path = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_no_last_modified(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_if_modified_since_after_tag_change(self):
+        since = http_date(self.recipe.updated_at.timestamp() + 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Обед'
+            self.tag.save()
+        response = self.client.get(self.path, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tags'][0]['name'], 'Обед')
+
+    def test_etag_changes_after_tag_change(self):
+        etag = self.client.get(self.path)['ETag']
+        self.assertEqual(
+            self.client.get(self.path, HTTP_IF_NONE_MATCH=etag).status_code,
+            304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Обед'
+            self.tag.save()
+        self.assertEqual(
+            self.client.get(self.path, HTTP_IF_NONE_MATCH=etag).status_code,
+            200)
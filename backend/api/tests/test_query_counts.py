@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
+                            MyUser, Recipe, ShoppingCart, SubscriptionUser,
+                            Tag)
+from recipes.search import uses_search_vector
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryCountTests(TestCase):
+    """Число запросов к базе не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            MyUser.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=str(number), password='pass')
+            for number in range(4)]
+        cls.user = MyUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читатель', password='pass')
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(30)]
+        for number in range(60):
+            recipe = Recipe.objects.create(
+                author=cls.authors[number % len(cls.authors)],
+                name=f'Рецепт {number}', text='Текст',
+                cooking_time=number + 1, image='recipe_images/test.png')
+            recipe.tags.set(cls.tags[:number % 3 + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1)
+                for ingredient in cls.ingredients[number % 10:][:5])
+            if number % 4 == 0:
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            if number % 7 == 0:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.authors:
+            SubscriptionUser.objects.create(user=cls.user, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_queries(self, number, path):
+        with self.assertNumQueries(number):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_list(self):
+        for limit in (6, 50):
+            with self.subTest(limit=limit):
+                cache.clear()
+                response = self.assert_queries(
+                    5, f'/api/recipes/?limit={limit}')
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_list_anonymous(self):
+        self.client.force_authenticate(None)
+        for limit in (6, 50):
+            with self.subTest(limit=limit):
+                cache.clear()
+                self.assert_queries(4, f'/api/recipes/?limit={limit}')
+
+    def test_recipe_detail(self):
+        recipe = Recipe.objects.first()
+        self.assert_queries(5, f'/api/recipes/{recipe.pk}/')
+
+    def test_subscriptions(self):
+        for recipes_limit in (1, 10):
+            with self.subTest(recipes_limit=recipes_limit):
+                cache.clear()
+                response = self.assert_queries(
+                    4, '/api/users/subscriptions/'
+                    f'?recipes_limit={recipes_limit}')
+                self.assertEqual(
+                    len(response.data['results'][0]['recipes']),
+                    recipes_limit)
+
+    def test_recipe_create(self):
+        # Без tsvector индекс поиска обновляется в памяти, без UPDATE.
+        queries = 15 if uses_search_vector() else 14
+        for count in (3, 30):
+            with self.subTest(ingredients=count):
+                cache.clear()
+                data = {
+                    'name': f'Новый рецепт {count}',
+                    'text': 'Текст',
+                    'cooking_time': 10,
+                    'image': IMAGE,
+                    'tags': [tag.pk for tag in self.tags],
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': 5}
+                        for ingredient in self.ingredients[:count]],
+                }
+                with self.assertNumQueries(queries):
+                    response = self.client.post(
+                        '/api/recipes/', data, format='json')
+                self.assertEqual(response.status_code, 201, response.data)
@@ -0,0 +1,111 @@
+import argparse
+import io
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from benchmarks import dataset
+from recipes.models import MyUser, Recipe
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужна база PostgreSQL.')
+class QueryPlanTests(TransactionTestCase):
+    """Горячие запросы views идут по индексам на наборе benchmarks.dataset.
+
+    Планы строятся для SQL, который выполняют сами запросы к API, после
+    ANALYZE и без запрета последовательного чтения. TransactionTestCase:
+    импорт набора пишет рецепты в нескольких потоках.
+    """
+
+    def setUp(self):
+        parser = argparse.ArgumentParser()
+        dataset.add_arguments(parser)
+        dataset.generate(parser.parse_args([]), log=lambda message: None)
+        call_command('build_recommendations', stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.user = MyUser.objects.filter(
+            username__startswith=dataset.PREFIX).order_by('username').first()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def column_index(self, table, column):
+        """Обычный индекс по одному столбцу, например у внешнего ключа."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, table)
+        return next(
+            name for name, constraint in constraints.items()
+            if constraint['index'] and not constraint['unique']
+            and constraint['columns'] == [column])
+
+    def plans(self, path, marker):
+        """Планы запросов к path, в SQL которых есть marker."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in captured:
+                if marker in query['sql']:
+                    cursor.execute(f'EXPLAIN {query["sql"]}')
+                    plans.append('\n'.join(row for row, in cursor.fetchall()))
+        self.assertTrue(plans, f'Нет запроса с {marker}')
+        return plans
+
+    def test_hot_queries_use_indexes(self):
+        recipe = Recipe.objects.order_by('-favorites_count', '-id').first()
+        slugs = [slug for _, slug in dataset.TAGS[:2]]
+        cases = (
+            ('/api/recipes/', '"recipes_recipe"."pub_date" DESC',
+             ('recipe_pub_date_id_idx',)),
+            (f'/api/recipes/?author={self.user.pk}',
+             '"recipes_recipe"."author_id" =',
+             ('recipe_author_pub_date_idx',)),
+            ('/api/recipes/?' + '&'.join(f'tags={slug}' for slug in slugs),
+             'FROM "recipes_recipe" INNER JOIN "recipes_tagrecipe"',
+             ('tag_recipe_tag_idx', 'unique_tag_recipe')),
+            ('/api/recipes/?is_favorited=1',
+             '"recipes_favoriterecipe"."user_id" =',
+             ('favoriterecipe_unique_user_recipe',
+              'favoriterecipe_user_time_idx')),
+            ('/api/recipes/?is_in_shopping_cart=1',
+             '"recipes_shoppingcart"."user_id" =',
+             ('shoppingcart_unique_user_recipe',
+              'shoppingcart_user_time_idx')),
+            ('/api/recipes/?ordering=popular', '"favorites_count" DESC',
+             ('recipe_popular_idx',)),
+            ('/api/recipes/?ordering=trending', '"trending_score" DESC',
+             ('recipe_trending_idx',)),
+            ('/api/recipes/?ordering=quick', '"cooking_time" ASC',
+             ('recipe_quick_idx',)),
+            ('/api/users/subscriptions/',
+             '"recipes_subscriptionuser"."user_id" =',
+             ('subscription_user_author_idx', 'unique_subscription')),
+            # На небольшой ленте и корзине пользователя планировщик
+            # выбирает индекс по user_id с сортировкой: это тоже индекс.
+            ('/api/recipes/feed/', 'FROM "recipes_feedentry"',
+             ('feed_user_pub_date_idx',
+              self.column_index('recipes_feedentry', 'user_id'))),
+            ('/api/recipes/download_shopping_cart/?format=txt',
+             'FROM "recipes_shoppingcartingredient"',
+             ('cart_ingredient_user_name_idx', 'unique_cart_ingredient')),
+            (f'/api/recipes/{recipe.pk}/similar/',
+             'FROM "recipes_recipesimilarity"',
+             ('recipe_similarity_score_idx',
+              self.column_index('recipes_recipesimilarity', 'recipe_id'))),
+        )
+        for path, marker, indexes in cases:
+            with self.subTest(path=path):
+                plans = self.plans(path, marker)
+                self.assertTrue(
+                    any(index in plan for plan in plans for index in indexes),
+                    '\n\n'.join(plans))
@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, MyUser, Recipe, Tag
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeNameTests(TestCase):
+    """Название рецепта уникально у автора: повтор — ошибка 400."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MyUser.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Повар', password='pass')
+        cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Борщ', text='Текст', cooking_time=10,
+            image='recipe_images/test.png')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_duplicate_name(self):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Борщ', 'text': 'Текст', 'cooking_time': 10,
+            'image': IMAGE, 'tags': [self.tag.pk],
+            'ingredients': [{'id': self.salt.pk, 'amount': 5}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name', response.data)
+        # Своё же название при редактировании не считается повтором.
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {'name': 'Борщ', 'text': 'Новый текст'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
@@ -1,8 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                    UserSubscriptionsViewSet, UserViewSet)
+from foodgram.settings import SERVER_MODE
+
+from .async_views import async_routes
+from .views import (DatabaseMetricsView, IngredientViewSet, RecipeViewSet,
+                    TagViewSet, UserSubscriptionsViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -13,11 +16,17 @@ router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 
+router_urls = router_v1.urls
+if SERVER_MODE == 'asgi':
+    router_urls = async_routes(
+        router_urls, (RecipeViewSet, TagViewSet, IngredientViewSet))
+
 urlpatterns = [
     path(
         'users/subscriptions/',
         UserSubscriptionsViewSet.as_view({'get': 'list'})),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
-    path('', include(router_v1.urls)),
+    path('metrics/db/', DatabaseMetricsView.as_view()),
+    path('', include(router_urls)),
 ]
@@ -1,7 +1,30 @@
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.response import Response
 
+from foodgram.settings import EXPORT_CHUNK_SIZE
+from foodgram.streaming import AsyncStreamingHttpResponse, iterate_in_thread
+
+
+def get_recipes_limit(request):
+    if request is None:
+        return None
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def get_limit(request, maximum):
+    """?limit= из запроса, не больше maximum."""
+    try:
+        limit = int(request.query_params.get('limit'))
+    except (TypeError, ValueError):
+        return maximum
+    return min(limit, maximum) if limit > 0 else maximum
+
 
 def to_shopping_cart_or_favorite(request, instance, serializer_class):
     serializer = serializer_class(
@@ -9,7 +32,9 @@ def to_shopping_cart_or_favorite(request, instance, serializer_class):
         context={'request': request}
     )
     serializer.is_valid(raise_exception=True)
-    serializer.save()
+    # Запись и счётчики в сигналах фиксируются вместе.
+    with transaction.atomic():
+        serializer.save()
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -22,16 +47,22 @@ def remove_from_shopping_cart_or_favorites(request, instance, model):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def download_cart(shop_list):
-    file_name = 'shopping_cart.txt'
-    lines = []
-    for element in shop_list:
-        name = element['ingredient__name']
-        measurement_unit = element['ingredient__measurement_unit']
-        amount = element['ingredient_sum']
-        lines.append(f'{name} - {amount} ({measurement_unit})')
-    content = '\n'.join(lines)
-    content_type = 'text/plain,charset=utf8'
-    response = HttpResponse(content, content_type=content_type)
+def download_cart(shop_list, renderer, asgi=False):
+    """Потоковая выгрузка списка покупок.
+
+    Под ASGI строки читаются и форматируются пачками по
+    EXPORT_CHUNK_SIZE частей в потоке view, а не в цикле событий.
+    """
+    file_name = f'shopping_cart.{renderer.format}'
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    content = renderer.export(shop_list)
+    if asgi:
+        response = AsyncStreamingHttpResponse(
+            iterate_in_thread(content, EXPORT_CHUNK_SIZE),
+            content_type=content_type)
+    else:
+        response = StreamingHttpResponse(content, content_type=content_type)
     response['Content-Disposition'] = f'attachment; filename={file_name}'
     return response
@@ -1,27 +1,46 @@
-from django.db.models import Sum
+from collections import defaultdict
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from foodgram.settings import RECIPE_LINK
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
-                            MyUser, Recipe, ShoppingCart, SubscriptionUser,
-                            Tag)
+from foodgram.postgresql.base import stats
+from foodgram.settings import (EXPORT_CHUNK_SIZE, RECIPE_LINK,
+                               RECOMMENDATION_NEIGHBOURS)
+from recipes.feeds import get_feed_page
+from recipes.models import (FavoriteRecipe, Ingredient, MyUser, Recipe,
+                            ShoppingCart, ShoppingCartIngredient,
+                            SubscriptionUser, Tag)
+from recipes.services import get_recommended_recipes, get_similar_recipes
 
-from .filters import IngredientFilter, RecipeFilter
-from .paginators import CustomHomePagination
+from .autocomplete import ingredient_autocomplete
+from .cache import (ConditionalGetMixin, VersionedResponseCacheMixin,
+                    get_versions, make_etag)
+from .filters import RecipeFilter
+from .matching import recipe_matcher
+from .paginators import (CustomHomePagination, FeedPagination,
+                         KeysetPagination, RecipeMatchPagination)
+from .renderers import CSVCartRenderer, PDFCartRenderer, PlainTextCartRenderer
 from .serializers import (AvatarSerializer, CreateUpdateRecipeSerializer,
                           FavoriteRecipeSerializer, IngredientSerializer,
-                          ReadOnlyRecipeSerializer, ShoppingCartSerializer,
-                          TagSerializer, UserGetSubscribeSerializer,
-                          UserSerializer)
-from .utils import (download_cart, remove_from_shopping_cart_or_favorites,
+                          ReadOnlyRecipeSerializer, RecipeMatchQuerySerializer,
+                          RecipeMatchSerializer, RecipeShortInfoSerializer,
+                          ShoppingCartSerializer, TagSerializer,
+                          UserGetSubscribeSerializer, UserSerializer)
+from .utils import (download_cart, get_limit, get_recipes_limit,
+                    remove_from_shopping_cart_or_favorites,
                     to_shopping_cart_or_favorite)
 
+# Порядки выдачи, которые меняются без изменения самих рецептов.
+ORDERING_NAMESPACES = {'popular': 'popularity', 'trending': 'trending'}
+
 
 class UserViewSet(UserViewSet):
     """Вьюсет для модели User."""
@@ -54,7 +73,9 @@ class UserViewSet(UserViewSet):
                 author, data=request.data, context={'request': request}
             )
             serializer.is_valid(raise_exception=True)
-            SubscriptionUser.objects.create(user=subscriber, author=author)
+            with transaction.atomic():
+                SubscriptionUser.objects.create(
+                    user=subscriber, author=author)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
@@ -79,27 +100,38 @@ class UserViewSet(UserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    VersionedResponseCacheMixin, viewsets.ReadOnlyModelViewSet
+):
     """ViewSet для модели Ingredient."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
     pagination_class = None
+    cache_namespace = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name'):
+            return self.cached_response(self.search, request)
+        return super().list(request, *args, **kwargs)
 
+    def search(self, request):
+        return Response(
+            ingredient_autocomplete.search(request.query_params['name']))
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(VersionedResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для модели Tag."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    cache_namespace = 'tags'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet для модели Recipe."""
 
     queryset = Recipe.objects.all()
@@ -108,6 +140,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     pagination_class = CustomHomePagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_versions(self, *namespaces):
+        user = self.request.user
+        if user.is_authenticated:
+            namespaces += (f'relations:{user.id}',)
+        return (user.id, *get_versions('tags', 'ingredients', 'users',
+                                       *namespaces))
+
+    def get_list_validators(self):
+        namespaces = ('recipes',)
+        ordering = ORDERING_NAMESPACES.get(
+            self.request.query_params.get('ordering'))
+        if ordering:
+            namespaces += (ordering,)
+        etag = make_etag(
+            'recipes', self.request.get_full_path(),
+            *self.get_versions(*namespaces))
+        return etag, None
+
+    def get_object_validators(self):
+        try:
+            updated_at = Recipe.objects.filter(
+                pk=self.kwargs['pk']
+            ).values_list('updated_at', flat=True).first()
+        except ValueError:
+            updated_at = None
+        if updated_at is None:
+            return None, None
+        etag = make_etag(
+            'recipe', self.kwargs['pk'], updated_at.isoformat(),
+            *self.get_versions())
+        # Без Last-Modified: updated_at не меняется при правке тегов,
+        # ингредиентов и автора, и клиент с одним If-Modified-Since
+        # получал бы 304 на устаревший ответ.
+        return etag, None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_relations()
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return ReadOnlyRecipeSerializer
@@ -129,16 +212,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        permission_classes=(IsAuthenticated,))
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            PlainTextCartRenderer, CSVCartRenderer, PDFCartRenderer,),)
     def download_shopping_cart(self, request):
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__cart_recipe__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(ingredient_sum=Sum('amount'))
-        return download_cart(ingredients)
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
+        ).values_list(
+            'name', 'measurement_unit', 'amount'
+        ).order_by('name').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return download_cart(
+            ingredients, request.accepted_renderer,
+            asgi=isinstance(request._request, ASGIRequest))
 
     @action(
         detail=True, methods=('post', 'delete'),
@@ -153,6 +238,67 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return remove_from_shopping_cart_or_favorites(
                 request, recipe, FavoriteRecipe)
 
+    @action(
+        detail=False, url_path='what-can-i-cook',
+        url_name='what-can-i-cook',)
+    def what_can_i_cook(self, request):
+        """Рецепты по списку имеющихся ингредиентов (?ingredients=1&...).
+
+        mode=all — есть всё для рецепта, mode=missing — не хватает не
+        больше ?missing ингредиентов, mode=jaccard — по похожести набора.
+        """
+        params = RecipeMatchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        paginator = RecipeMatchPagination()
+        matches = paginator.paginate_queryset(
+            recipe_matcher.match(
+                data['ingredients'], data['mode'], data['missing']),
+            request, self)
+        recipes = Recipe.objects.with_relations().in_bulk(
+            [match.recipe_id for match in matches])
+        page = []
+        for match in matches:
+            # Рецепт мог быть удалён после сборки индекса.
+            recipe = recipes.get(match.recipe_id)
+            if recipe is not None:
+                recipe.matched = match.matched
+                recipe.missing = match.missing
+                recipe.score = match.score
+                page.append(recipe)
+        serializer = RecipeMatchSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_feed_page(self, after, limit):
+        rows = get_feed_page(self.request.user, after, limit)
+        recipes = Recipe.objects.with_relations().in_bulk(
+            [pk for _, pk in rows])
+        return [recipes[pk] for _, pk in rows if pk in recipes]
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        paginator = FeedPagination()
+        page = paginator.paginate_feed(self.get_feed_page, request, Recipe)
+        serializer = ReadOnlyRecipeSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe, id=pk)
+        recipes = get_similar_recipes(
+            recipe.id, get_limit(request, RECOMMENDATION_NEIGHBOURS))
+        return Response(RecipeShortInfoSerializer(
+            recipes, many=True, context={'request': request}).data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def recommended(self, request):
+        recipes = get_recommended_recipes(
+            request.user, get_limit(request, RECOMMENDATION_NEIGHBOURS))
+        return Response(RecipeShortInfoSerializer(
+            recipes, many=True, context={'request': request}).data)
+
     @action(
         methods=('get',), detail=True,
         url_path='get-link', url_name='get-link',)
@@ -169,4 +315,40 @@ class UserSubscriptionsViewSet(
     serializer_class = UserGetSubscribeSerializer
 
     def get_queryset(self):
-        return MyUser.objects.filter(subscribed_to__user=self.request.user)
+        return MyUser.objects.filter(
+            subscribed_to__user=self.request.user
+        ).order_by('username')
+
+    def paginate_queryset(self, queryset):
+        authors = super().paginate_queryset(queryset)
+        if not authors:
+            return authors
+        recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_authors(
+            [author.id for author in authors],
+            get_recipes_limit(self.request),
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes[author.id]
+        return authors
+
+
+class DatabaseMetricsView(APIView):
+    """Соединения с базами в процессе, который обработал запрос.
+
+    У каждого воркера gunicorn свои счётчики, в ответе есть его pid.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        metrics = stats.snapshot()
+        for alias, settings in connections.settings.items():
+            metrics['databases'].setdefault(alias, {}).update(
+                conn_max_age=settings['CONN_MAX_AGE'],
+                health_checks=settings.get('CONN_HEALTH_CHECKS', False),
+                server_side_cursors=not settings.get(
+                    'DISABLE_SERVER_SIDE_CURSORS', False),
+            )
+        return Response(metrics)
@@ -0,0 +1,6 @@
+"""Замеры производительности, запускаются из каталога backend.
+
+Каждый модуль запускается как python -m benchmarks.<имя> и работает с
+базой из настроек Django; сгенерированные данные откатываются. Набор
+dataset, на котором работает api, остаётся в базе между прогонами.
+"""
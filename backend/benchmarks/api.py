@@ -0,0 +1,229 @@
+"""Замер API по сценариям пользователей на наборе benchmarks.dataset.
+
+Сценарии из scenarios.py выполняются тестовым клиентом Django в этом же
+процессе, по очереди, от имени пользователей набора, выбранных по seed.
+По каждому endpoint считаются запросы в секунду (по суммарному времени
+ответов), p50/p95/p99 и число SQL-запросов на ответ по всем базам.
+Параллельную нагрузку через настоящий сервер меряет benchmarks.load.
+
+Результат в JSON (--output) вместе с коммитом и объёмом набора; --compare
+сравнивает с прежним файлом и возвращает код 1, если у endpoint выросло
+число SQL-запросов или p50 вырос больше чем на --threshold; p95 и p99
+на десятках повторов слишком шумные и только печатаются.
+
+    python -m benchmarks.dataset
+    python -m benchmarks.api --output before.json
+    python -m benchmarks.api --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import django
+
+from . import dataset
+from .scenarios import SCENARIOS, Context
+
+BACKEND_DIR = dataset.BACKEND_DIR
+
+
+class Clients:
+    """Тестовый клиент с токеном на каждого пользователя набора."""
+
+    def __init__(self):
+        self.clients = {}
+
+    def __call__(self, user):
+        from django.test import Client
+        from rest_framework.authtoken.models import Token
+
+        if user.pk not in self.clients:
+            token, _ = Token.objects.get_or_create(user=user)
+            self.clients[user.pk] = Client(
+                SERVER_NAME='localhost',
+                HTTP_AUTHORIZATION=f'Token {token.key}')
+        return self.clients[user.pk]
+
+
+def perform(client, request):
+    """Ответ, время в миллисекундах и число SQL-запросов по всем базам."""
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    options = {}
+    if request.data is not None:
+        options = {
+            'data': json.dumps(request.data),
+            'content_type': 'application/json'}
+    with ExitStack() as stack:
+        captured = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections]
+        start = time.perf_counter()
+        response = getattr(client, request.method)(request.path, **options)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - start) * 1000
+    return response, elapsed, sum(len(queries) for queries in captured)
+
+
+def run_scenarios(options):
+    context = Context(options.seed)
+    clients = Clients()
+    samples = defaultdict(lambda: ([], [], Counter()))
+    for iteration in range(options.warmup + options.iterations):
+        for name in options.scenarios:
+            user = context.rng.choice(context.users)
+            scenario = SCENARIOS[name](context, user)
+            response = None
+            while True:
+                try:
+                    request = scenario.send(response)
+                except StopIteration:
+                    break
+                response, elapsed, queries = perform(clients(user), request)
+                if iteration >= options.warmup:
+                    latencies, counts, statuses = samples[request.endpoint]
+                    latencies.append(elapsed)
+                    counts.append(queries)
+                    statuses[response.status_code] += 1
+    return {
+        endpoint: summarize(*samples[endpoint]) for endpoint in sorted(samples)
+    }
+
+
+def summarize(latencies, counts, statuses):
+    if len(latencies) > 1:
+        percentiles = statistics.quantiles(latencies, n=100)
+    else:
+        percentiles = latencies * 99
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / sum(latencies) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'p50_ms': round(percentiles[49], 2),
+        'p95_ms': round(percentiles[94], 2),
+        'p99_ms': round(percentiles[98], 2),
+        'queries': round(statistics.mean(counts), 1),
+        'max_queries': max(counts),
+        'statuses': {
+            str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), cwd=BACKEND_DIR, check=True,
+            capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(options):
+    from django.db import connection
+
+    from recipes.models import (FavoriteRecipe, MyUser, Recipe, ShoppingCart,
+                                SubscriptionUser)
+
+    users = MyUser.objects.filter(username__startswith=dataset.PREFIX)
+    return {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'seed': options.seed,
+        'iterations': options.iterations,
+        'warmup': options.warmup,
+        'scenarios': options.scenarios,
+        'dataset': {
+            'users': users.count(),
+            'recipes': Recipe.objects.filter(author__in=users).count(),
+            'favorites': FavoriteRecipe.objects.filter(user__in=users).count(),
+            'carts': ShoppingCart.objects.filter(user__in=users).count(),
+            'subscriptions': SubscriptionUser.objects.filter(
+                user__in=users).count(),
+        },
+    }
+
+
+def print_table(endpoints):
+    print(f'{"endpoint":<58}{"в секунду":>10}{"p50, мс":>9}{"p95, мс":>9}'
+          f'{"p99, мс":>9}{"SQL":>6}')
+    for endpoint, result in endpoints.items():
+        print(f'{endpoint:<58}{result["rps"]:>10.1f}{result["p50_ms"]:>9.2f}'
+              f'{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+              f'{result["queries"]:>6.1f}')
+
+
+def compare(before, after, threshold):
+    """Печатает изменения по endpoint, возвращает число регрессий."""
+    regressions = 0
+    print(f'\nСравнение с {before["meta"].get("commit") or "файлом"}:')
+    differs = [
+        key for key in ('database', 'seed', 'iterations', 'scenarios',
+                        'dataset')
+        if before['meta'].get(key) != after['meta'][key]]
+    if differs:
+        print(f'  прогоны не сравнимы по: {", ".join(differs)}')
+    for endpoint, result in after['endpoints'].items():
+        old = before['endpoints'].get(endpoint)
+        if old is None:
+            print(f'  новый      {endpoint}')
+            continue
+        worse = (
+            result['queries'] > old['queries']
+            or result['p50_ms'] > old['p50_ms'] * (1 + threshold))
+        changes = [
+            f'{metric} {old[metric]} -> {result[metric]}'
+            for metric in ('p50_ms', 'p95_ms', 'queries')]
+        regressions += worse
+        print(f'  {"РЕГРЕССИЯ" if worse else "ok":<11}{endpoint}: '
+              f'{", ".join(changes)}')
+    for endpoint in sorted(
+            before['endpoints'].keys() - after['endpoints'].keys()):
+        print(f'  пропал     {endpoint}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='повторов каждого сценария')
+    parser.add_argument('--warmup', type=int, default=2,
+                        help='повторов без замера, для прогрева кеша')
+    parser.add_argument('--scenarios', nargs='+', choices=tuple(SCENARIOS),
+                        default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    parser.add_argument('--compare', help='JSON прежнего прогона')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='допустимый рост p50, доля')
+    options = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    if not dataset.exists():
+        sys.exit('Нет набора данных: python -m benchmarks.dataset')
+    result = {'meta': metadata(options), 'endpoints': run_scenarios(options)}
+    print_table(result['endpoints'])
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as file:
+            before = json.load(file)
+        if compare(before, result, options.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Постоянные соединения с PostgreSQL против соединения на каждый запрос.
+
+Сервер gunicorn.conf.py запускается с разными DB_CONN_MAX_AGE и
+DB_CONN_HEALTH_CHECKS, клиенты по keep-alive читают дешёвые страницы:
+при CONN_MAX_AGE=0 каждый запрос сначала открывает соединение с базой.
+Нужна база PostgreSQL с данными; сервер получает текущие переменные
+окружения, поэтому через DB_HOST=pgbouncer проверяется и PgBouncer.
+
+    python -m benchmarks.connections --workers 2 --clients 2
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from .load import get, reader, start_server
+
+PATHS = ('/api/recipes/{recipe_id}/', '/api/users/?limit=6')
+CONFIGS = (
+    ('на запрос', {'DB_CONN_MAX_AGE': '0'}),
+    ('постоянные', {
+        'DB_CONN_MAX_AGE': '60', 'DB_CONN_HEALTH_CHECKS': 'False'}),
+    ('с проверкой', {
+        'DB_CONN_MAX_AGE': '60', 'DB_CONN_HEALTH_CHECKS': 'True'}),
+)
+
+
+def run(environ, options):
+    server = start_server(options.mode, options, **environ)
+    try:
+        status, content = get(options.port, '/api/recipes/?limit=1')
+        results = json.loads(content)['results'] if status == 200 else []
+        recipe_id = results[0]['id'] if results else 1
+        paths = [path.format(recipe_id=recipe_id) for path in PATHS]
+        deadline = time.monotonic() + options.duration
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(
+                target=reader,
+                args=(options.port, paths, deadline, latencies, errors))
+            for _ in range(options.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+    if len(latencies) < 2:
+        return 0, 0, 0, len(errors)
+    percentiles = statistics.quantiles(latencies, n=100)
+    return (
+        len(latencies) / options.duration, percentiles[49], percentiles[98],
+        len(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--mode', default='wsgi', choices=('wsgi', 'asgi'))
+    options = parser.parse_args()
+    print(f'{"соединения":<14}{"в секунду":>11}{"p50, мс":>10}'
+          f'{"p99, мс":>10}{"ошибок":>8}')
+    for name, environ in CONFIGS:
+        rps, p50, p99, errors = run(environ, options)
+        print(f'{name:<14}{rps:>11.1f}{p50:>10.2f}{p99:>10.2f}{errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
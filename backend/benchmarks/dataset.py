@@ -0,0 +1,172 @@
+"""Детерминированный набор данных для benchmarks.api.
+
+Ингредиенты загружаются командой load_csv, рецепты — тем же импортом,
+что и import_data (теги, ингредиенты, поиск, ленты), избранное, корзины
+и подписки пишутся пачками, после чего счётчики, суммы корзин, рейтинг
+«в тренде» и ленты пересобираются командами. Одинаковые параметры и
+seed дают одинаковые данные. В отличие от остальных замеров данные
+остаются в базе, поэтому нужна отдельная база; пользователи набора
+начинаются с PREFIX, --regenerate удаляет их вместе с рецептами.
+
+    python -m benchmarks.dataset --users 200 --recipes 2000
+"""
+import argparse
+import io
+import os
+import random
+from itertools import accumulate
+
+import django
+
+from .search import WORDS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGREDIENTS_PATH = os.path.join(
+    os.path.dirname(BACKEND_DIR), 'data', 'ingredients.json')
+PREFIX = 'bench_'
+TAGS = (
+    ('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'), ('Суп', 'soup'), ('Салат', 'salad'),
+    ('Выпечка', 'baking'), ('Напитки', 'drinks'),
+)
+IMAGE = 'recipe_images/benchmark.png'
+
+
+class Skewed:
+    """Выбор без повторов: первые элементы выпадают чаще, как у Ципфа."""
+
+    def __init__(self, items):
+        self.items = items
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(items))))
+
+    def sample(self, rng, count):
+        chosen = set(rng.choices(
+            range(len(self.items)), cum_weights=self.cum_weights, k=count))
+        return [self.items[index] for index in sorted(chosen)]
+
+
+def recipe_records(rng, usernames, ingredients, count):
+    ingredients = Skewed(ingredients)
+    for number in range(count):
+        yield {
+            'author': rng.choice(usernames),
+            'name': f'{" ".join(rng.sample(WORDS, 2))} {number}',
+            'text': ' '.join(rng.choice(WORDS) for _ in range(30)),
+            'cooking_time': rng.randint(5, 180),
+            'image': IMAGE,
+            'tags': [slug for _, slug in rng.sample(TAGS, rng.randint(1, 3))],
+            'ingredients': [
+                {'name': name, 'amount': rng.randint(1, 500)}
+                for name in ingredients.sample(rng, rng.randint(3, 12))],
+        }
+
+
+def exists():
+    from recipes.models import MyUser
+
+    return MyUser.objects.filter(username__startswith=PREFIX).exists()
+
+
+def delete():
+    from recipes.models import MyUser
+
+    MyUser.objects.filter(username__startswith=PREFIX).delete()
+
+
+def generate(options, log=print):
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+
+    from api.cache import bump_version
+    from recipes.importers import DATASETS, import_recipes, import_rows
+    from recipes.models import (FavoriteRecipe, Ingredient, MyUser, Recipe,
+                                ShoppingCart, SubscriptionUser)
+
+    rng = random.Random(options.seed)
+    quiet = io.StringIO()
+    call_command('load_csv', options.ingredients, stdout=quiet)
+    import_rows(DATASETS['tags'], (
+        {'name': name, 'slug': slug} for name, slug in TAGS))
+    ingredients = list(
+        Ingredient.objects.order_by('name').values_list('name', flat=True))
+    password = make_password(None)
+    MyUser.objects.bulk_create(
+        MyUser(
+            username=f'{PREFIX}{number:06d}',
+            email=f'{PREFIX}{number:06d}@example.com',
+            first_name='Бенчмарк', last_name=str(number), password=password)
+        for number in range(options.users))
+    users = list(MyUser.objects.filter(
+        username__startswith=PREFIX).order_by('username'))
+    log(f'Пользователей: {len(users)}')
+    usernames = [user.username for user in users]
+    import_recipes(
+        recipe_records(rng, usernames, ingredients, options.recipes),
+        workers=options.workers)
+    # id зависят от порядка потоков импорта, названия — нет.
+    recipes = list(Recipe.objects.filter(
+        author__username__startswith=PREFIX).order_by('name').values_list(
+            'pk', flat=True))
+    log(f'Рецептов: {len(recipes)}')
+    # Популярные рецепты и авторы в начале списков, как в жизни.
+    popular_recipes, popular_authors = Skewed(recipes), Skewed(users)
+    for model, per_user in (
+        (FavoriteRecipe, options.favorites), (ShoppingCart, options.carts)
+    ):
+        model.objects.bulk_create((
+            model(user=user, recipe_id=recipe)
+            for user in users
+            for recipe in popular_recipes.sample(rng, per_user)
+        ), batch_size=5000, ignore_conflicts=True)
+    SubscriptionUser.objects.bulk_create((
+        SubscriptionUser(user=user, author=author)
+        for user in users
+        for author in popular_authors.sample(rng, options.subscriptions)
+        if author != user
+    ), batch_size=5000, ignore_conflicts=True)
+    log('Пересборка счётчиков, корзин, рейтинга и лент')
+    for command in (
+        'reconcile_counters', 'rebuild_cart_totals', 'refresh_trending',
+        'rebuild_feeds',
+    ):
+        call_command(command, stdout=quiet)
+    for namespace in (
+        'ingredients', 'tags', 'recipes', 'users', 'popularity',
+        'recipe_ingredients',
+    ):
+        bump_version(namespace)
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--favorites', type=int, default=20,
+                        help='избранных рецептов на пользователя')
+    parser.add_argument('--carts', type=int, default=5,
+                        help='рецептов в корзине на пользователя')
+    parser.add_argument('--subscriptions', type=int, default=10,
+                        help='подписок на пользователя')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--ingredients', default=INGREDIENTS_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    parser.add_argument('--regenerate', action='store_true',
+                        help='удалить прежний набор и создать заново')
+    options = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    if exists():
+        if not options.regenerate:
+            print('Набор уже создан, для пересоздания есть --regenerate.')
+            return
+        delete()
+    generate(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Нагрузка на чтение: gunicorn с синхронными воркерами против uvicorn.
+
+Для каждого режима SERVER_MODE запускается gunicorn.conf.py с одинаковым
+числом воркеров. Часть клиентов читает рецепты, теги и ингредиенты,
+остальные медленно отправляют тело POST-запроса, как загрузка фото по
+мобильной сети. Синхронный воркер занят таким клиентом целиком, uvicorn
+читает тело асинхронно. Нужна база с данными, например после
+import_data; сервер получает текущие переменные окружения.
+
+    python -m benchmarks.load --workers 2 --clients 16 --slow-clients 4
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=20&pagination=cursor',
+    '/api/recipes/{recipe_id}/',
+    '/api/tags/',
+    f'/api/ingredients/?name={quote("а")}',
+)
+
+
+def start_server(mode, options, **environ):
+    env = dict(
+        os.environ, SERVER_MODE=mode,
+        GUNICORN_WORKERS=str(options.workers),
+        GUNICORN_BIND=f'127.0.0.1:{options.port}', **environ)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            get(options.port, '/api/tags/')
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'Сервер {mode} не запустился.')
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def reader(port, paths, deadline, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    for path in itertools.cycle(paths):
+        if time.monotonic() >= deadline:
+            break
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise http.client.HTTPException(response.status)
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            connection.close()
+            # Без паузы отказ в соединении крутит цикл вхолостую.
+            time.sleep(0.05)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    connection.close()
+
+
+def slow_uploader(port, deadline, interval):
+    """Отправляет тело запроса по байту раз в interval секунд."""
+    body = b'{"email": "' + b'x' * 64 + b'"}'
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), 30) as sock:
+                sock.sendall(
+                    b'POST /api/users/ HTTP/1.1\r\nHost: localhost\r\n'
+                    b'Content-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n' % len(body))
+                for byte in body:
+                    if time.monotonic() >= deadline:
+                        break
+                    sock.sendall(bytes((byte,)))
+                    time.sleep(interval)
+                else:
+                    sock.recv(65536)
+        except OSError:
+            time.sleep(interval)
+
+
+def run(mode, options):
+    server = start_server(mode, options)
+    try:
+        status, content = get(options.port, '/api/recipes/?limit=1')
+        results = json.loads(content)['results'] if status == 200 else []
+        recipe_id = results[0]['id'] if results else 1
+        paths = [path.format(recipe_id=recipe_id) for path in PATHS]
+        deadline = time.monotonic() + options.duration
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(
+                target=slow_uploader,
+                args=(options.port, deadline, options.slow_interval))
+            for _ in range(options.slow_clients)
+        ] + [
+            threading.Thread(
+                target=reader,
+                args=(options.port, paths[number % len(paths):] + paths[
+                    :number % len(paths)], deadline, latencies, errors))
+            for number in range(options.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+    if len(latencies) < 2:
+        return mode, len(latencies), 0, 0, 0, 0, len(errors)
+    percentiles = statistics.quantiles(latencies, n=100)
+    return (
+        mode, len(latencies), len(latencies) / options.duration,
+        percentiles[49], percentiles[94], percentiles[98], len(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--slow-clients', type=int, default=4)
+    parser.add_argument('--slow-interval', type=float, default=0.2)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument(
+        '--modes', nargs='+', default=('wsgi', 'asgi'),
+        choices=('wsgi', 'asgi'))
+    options = parser.parse_args()
+    print(f'{"режим":<7}{"запросов":>10}{"в секунду":>11}{"p50, мс":>10}'
+          f'{"p95, мс":>10}{"p99, мс":>10}{"ошибок":>8}')
+    for mode in options.modes:
+        name, total, rps, p50, p95, p99, errors = run(mode, options)
+        print(f'{name:<7}{total:>10}{rps:>11.1f}{p50:>10.1f}{p95:>10.1f}'
+              f'{p99:>10.1f}{errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
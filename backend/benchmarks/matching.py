@@ -0,0 +1,85 @@
+"""Подбор рецептов по ингредиентам: битовый индекс против перебора
+множеств. Связи рецептов генерируются в памяти, база не нужна.
+
+    python -m benchmarks.matching --recipes 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+from .timing import measure
+
+PANTRY_SIZES = (5, 20, 50)
+
+
+def generate(recipes, ingredients, seed):
+    """Связи (рецепт, ингредиент); популярность ингредиентов как у Ципфа."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(ingredients)]
+    links = []
+    for recipe_id in range(1, recipes + 1):
+        chosen = rng.choices(range(ingredients), weights, k=rng.randint(3, 15))
+        links.extend((recipe_id, ingredient) for ingredient in sorted(
+            set(chosen)))
+    return links
+
+
+def scan(recipe_sets, pantry, mode, missing):
+    found = []
+    for recipe_id, ingredients in recipe_sets.items():
+        matched = len(ingredients & pantry)
+        lacking = len(ingredients) - matched
+        if matched and (mode == 'jaccard' or lacking <= missing):
+            found.append(
+                (lacking, -matched / len(ingredients | pantry), -recipe_id))
+    found.sort()
+    return len(found), found[:20]
+
+
+def run(options):
+    from api.matching import RecipeIngredientIndex
+
+    links = generate(options.recipes, options.ingredients, options.seed)
+    start = time.perf_counter()
+    index = RecipeIngredientIndex(links)
+    print(f'Рецептов: {options.recipes}, связей: {len(links)}, '
+          f'индексация: {(time.perf_counter() - start) * 1000:.0f} мс')
+    recipe_sets = {}
+    for recipe_id, ingredient in links:
+        recipe_sets.setdefault(recipe_id, set()).add(ingredient)
+    rng = random.Random(options.seed)
+    print(f'{"ингредиентов":<14}{"режим":<9}{"перебор, мс":>13}'
+          f'{"индекс, мс":>12}{"найдено":>9}')
+    for size in PANTRY_SIZES:
+        pantry = set(rng.sample(range(options.ingredients // 10), size))
+        for mode, missing in (('all', 0), ('missing', 2), ('jaccard', 0)):
+            scan_ms, _ = measure(
+                lambda: scan(recipe_sets, pantry, mode, missing),
+                options.repeat)
+
+            def indexed():
+                matches = index.match(pantry, mode, missing)
+                return len(matches), matches[0:20]
+
+            index_ms, (count, _) = measure(indexed, options.repeat)
+            print(f'{size:<14}{mode:<9}{scan_ms:>13.1f}{index_ms:>12.2f}'
+                  f'{count:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    run(options)
+
+
+if __name__ == '__main__':
+    main()
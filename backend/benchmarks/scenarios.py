@@ -0,0 +1,177 @@
+"""Сценарии пользователей для benchmarks.api.
+
+Сценарий — генератор запросов Request: раннер выполняет запрос и
+отправляет ответ обратно в генератор, поэтому следующий шаг может
+зависеть от ответа (курсор ленты, id созданного рецепта). Сценарии с
+записью убирают за собой, набор данных между прогонами не меняется.
+Название endpoint — шаблон пути, по нему группируются замеры.
+"""
+import random
+from collections import namedtuple
+from urllib.parse import urlencode, urlsplit
+
+from .dataset import PREFIX
+from .search import WORDS
+
+Request = namedtuple(
+    'Request', ('endpoint', 'method', 'path', 'data'), defaults=(None,))
+PAGE_SIZE = 6
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class Context:
+    """Данные набора, из которых сценарии берут id и фильтры."""
+
+    def __init__(self, seed):
+        from recipes.models import Ingredient, MyUser, Recipe, Tag
+
+        self.rng = random.Random(seed)
+        self.users = list(MyUser.objects.filter(
+            username__startswith=PREFIX).order_by('username'))
+        self.recipes = list(Recipe.objects.filter(
+            author__username__startswith=PREFIX).order_by(
+                'name').values_list('pk', flat=True))
+        self.tags = list(Tag.objects.order_by('slug').values_list(
+            'pk', 'slug'))
+        self.ingredients = list(Ingredient.objects.order_by(
+            'name').values_list('pk', 'name'))
+
+    def last_page(self):
+        return max(len(self.recipes) // PAGE_SIZE, 1)
+
+
+def relative(url):
+    parts = urlsplit(url)
+    return f'{parts.path}?{parts.query}' if parts.query else parts.path
+
+
+def feed_browsing(context, user):
+    rng = context.rng
+    yield Request('GET /api/recipes/', 'get', '/api/recipes/')
+    yield Request(
+        'GET /api/recipes/?page=N', 'get',
+        f'/api/recipes/?page={rng.randint(1, context.last_page())}')
+    yield Request(
+        'GET /api/recipes/?pagination=cursor', 'get',
+        '/api/recipes/?pagination=cursor&limit=20')
+    yield Request(
+        'GET /api/recipes/{id}/', 'get',
+        f'/api/recipes/{rng.choice(context.recipes)}/')
+    response = yield Request(
+        'GET /api/recipes/feed/', 'get', '/api/recipes/feed/?limit=10')
+    if response.status_code == 200 and response.json().get('next'):
+        yield Request(
+            'GET /api/recipes/feed/?cursor=', 'get',
+            relative(response.json()['next']))
+
+
+def filtering(context, user):
+    rng = context.rng
+    slugs = [slug for _, slug in rng.sample(context.tags, 2)]
+    yield Request(
+        'GET /api/recipes/?tags=', 'get',
+        '/api/recipes/?' + urlencode([('tags', slug) for slug in slugs]))
+    yield Request(
+        'GET /api/recipes/?is_favorited=1', 'get',
+        '/api/recipes/?is_favorited=1')
+    yield Request(
+        'GET /api/recipes/?is_in_shopping_cart=1', 'get',
+        '/api/recipes/?is_in_shopping_cart=1')
+    yield Request(
+        'GET /api/recipes/?author=', 'get',
+        f'/api/recipes/?author={rng.choice(context.users).pk}')
+    ordering = rng.choice(('popular', 'trending', 'quick'))
+    yield Request(
+        f'GET /api/recipes/?ordering={ordering}', 'get',
+        f'/api/recipes/?ordering={ordering}')
+    yield Request(
+        'GET /api/recipes/?search=', 'get',
+        '/api/recipes/?' + urlencode({'search': rng.choice(WORDS)}))
+    _, name = rng.choice(context.ingredients)
+    yield Request(
+        'GET /api/ingredients/?name=', 'get',
+        '/api/ingredients/?' + urlencode({'name': name[:3]}))
+
+
+def subscriptions(context, user):
+    from recipes.models import SubscriptionUser
+
+    rng = context.rng
+    yield Request(
+        'GET /api/users/subscriptions/', 'get',
+        '/api/users/subscriptions/?recipes_limit=3')
+    followed = set(SubscriptionUser.objects.filter(
+        user=user).values_list('author_id', flat=True))
+    authors = [
+        author.pk for author in context.users
+        if author.pk != user.pk and author.pk not in followed]
+    if not authors:
+        return
+    author = rng.choice(authors)
+    yield Request(
+        'GET /api/users/{id}/', 'get', f'/api/users/{author}/')
+    response = yield Request(
+        'POST /api/users/{id}/subscribe/', 'post',
+        f'/api/users/{author}/subscribe/')
+    if response.status_code == 201:
+        yield Request(
+            'DELETE /api/users/{id}/subscribe/', 'delete',
+            f'/api/users/{author}/subscribe/')
+
+
+def cart_download(context, user):
+    from recipes.models import ShoppingCart
+
+    in_cart = set(ShoppingCart.objects.filter(
+        user=user).values_list('recipe_id', flat=True))
+    recipes = [pk for pk in context.recipes if pk not in in_cart]
+    recipe = context.rng.choice(recipes) if recipes else None
+    if recipe:
+        response = yield Request(
+            'POST /api/recipes/{id}/shopping_cart/', 'post',
+            f'/api/recipes/{recipe}/shopping_cart/')
+        if response.status_code != 201:
+            recipe = None
+    for extension in ('txt', 'csv', 'pdf'):
+        yield Request(
+            f'GET /api/recipes/download_shopping_cart/?format={extension}',
+            'get', f'/api/recipes/download_shopping_cart/?format={extension}')
+    if recipe:
+        yield Request(
+            'DELETE /api/recipes/{id}/shopping_cart/', 'delete',
+            f'/api/recipes/{recipe}/shopping_cart/')
+
+
+def recipe_create(context, user):
+    rng = context.rng
+    data = {
+        'name': ' '.join(rng.sample(WORDS, 3)),
+        'text': ' '.join(rng.choice(WORDS) for _ in range(30)),
+        'cooking_time': rng.randint(5, 180),
+        'image': IMAGE,
+        'tags': [pk for pk, _ in rng.sample(context.tags, 2)],
+        'ingredients': [
+            {'id': pk, 'amount': rng.randint(1, 500)}
+            for pk, _ in rng.sample(context.ingredients, 8)],
+    }
+    response = yield Request('POST /api/recipes/', 'post', '/api/recipes/',
+                             data)
+    if response.status_code != 201:
+        return
+    recipe = response.json()['id']
+    data['ingredients'] = data['ingredients'][:5]
+    yield Request(
+        'PATCH /api/recipes/{id}/', 'patch', f'/api/recipes/{recipe}/', data)
+    yield Request(
+        'DELETE /api/recipes/{id}/', 'delete', f'/api/recipes/{recipe}/')
+
+
+SCENARIOS = {
+    'feed': feed_browsing,
+    'filtering': filtering,
+    'subscriptions': subscriptions,
+    'cart': cart_download,
+    'create': recipe_create,
+}
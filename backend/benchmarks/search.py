@@ -0,0 +1,118 @@
+"""Сравнение ?search= с наивным icontains по названию, описанию и
+ингредиентам.
+
+    python -m benchmarks.search --recipes 20000 --repeat 20
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+from .timing import measure
+
+WORDS = (
+    'томат', 'томаты', 'курица', 'куриный', 'суп', 'салат', 'сыр', 'сырный',
+    'картофель', 'грибы', 'грибной', 'рис', 'плов', 'говядина', 'лук',
+    'чеснок', 'морковь', 'пирог', 'яблоко', 'яблочный', 'сметана', 'борщ',
+    'свекла', 'капуста', 'паста', 'соус', 'базилик', 'перец', 'омлет',
+    'творог', 'блины', 'мёд', 'орехи', 'шоколад', 'лосось', 'креветки',
+)
+QUERIES = ('томат', 'куриный суп', 'сыр', 'грибной пирог', 'шоколад орехи')
+
+
+class Rollback(Exception):
+    """Откатывает сгенерированные данные после замеров."""
+
+
+def generate(recipes, seed):
+    from recipes.models import Ingredient, IngredientRecipe, MyUser, Recipe
+    from recipes.search import update_search_index
+
+    rng = random.Random(seed)
+    author = MyUser.objects.create_user(
+        email='benchmark@example.com', username='benchmark_search',
+        first_name='b', last_name='b', password=None)
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'{word} {number}', measurement_unit='г')
+        for number in range(20) for word in WORDS)
+    if not ingredients[0].pk:
+        ingredients = list(Ingredient.objects.filter(
+            name__in=[ingredient.name for ingredient in ingredients]))
+    created = []
+    for number in range(recipes):
+        recipe = Recipe(
+            author=author,
+            name=' '.join(rng.sample(WORDS, 3)),
+            text=' '.join(rng.choice(WORDS) for _ in range(40)),
+            cooking_time=rng.randint(1, 120),
+            image='recipe_images/benchmark.png',
+        )
+        recipe.save()
+        created.append(recipe)
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in created
+        for ingredient in rng.sample(ingredients, 5))
+    start = time.perf_counter()
+    update_search_index([recipe.id for recipe in created])
+    return (time.perf_counter() - start) * 1000
+
+
+def run(options):
+    from django.db import transaction
+    from django.db.models import Q
+
+    from recipes.models import Recipe
+    from recipes.search import search_index, search_recipes
+
+    def naive(query):
+        condition = Q()
+        for word in query.split():
+            condition &= (
+                Q(name__icontains=word) | Q(text__icontains=word)
+                | Q(ingredients__ingredient__name__icontains=word))
+        queryset = Recipe.objects.filter(condition).distinct()
+        return queryset.count(), list(queryset.order_by('-pub_date')[:6])
+
+    def ranked(query):
+        queryset = search_recipes(Recipe.objects.all(), query)
+        return queryset.count(), list(queryset[:6])
+
+    with transaction.atomic():
+        indexing = generate(options.recipes, options.seed)
+        if not search_index.ready:
+            start = time.perf_counter()
+            search_index.build()
+            indexing = (time.perf_counter() - start) * 1000
+        print(f'Рецептов: {Recipe.objects.count()}, '
+              f'индексация: {indexing:.0f} мс')
+        print(f'{"запрос":<16}{"icontains, мс":>15}{"найдено":>9}'
+              f'{"search, мс":>12}{"найдено":>9}')
+        for query in QUERIES:
+            naive_ms, (naive_count, _) = measure(
+                lambda: naive(query), options.repeat)
+            search_ms, (search_count, _) = measure(
+                lambda: ranked(query), options.repeat)
+            print(f'{query:<16}{naive_ms:>15.1f}{naive_count:>9}'
+                  f'{search_ms:>12.1f}{search_count:>9}')
+        raise Rollback
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    try:
+        run(options)
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
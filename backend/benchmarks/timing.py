@@ -0,0 +1,13 @@
+"""Общие функции замеров для модулей benchmarks."""
+import statistics
+import time
+
+
+def measure(function, repeat):
+    """Медиана времени repeat вызовов function в мс и результат вызова."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
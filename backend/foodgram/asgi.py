@@ -1,7 +1,12 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('SERVER_MODE', 'asgi')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from foodgram.streaming import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
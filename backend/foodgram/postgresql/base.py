@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from collections import Counter
+
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+
+class ConnectionStats:
+    """Счётчики соединений процесса по алиасам баз, общие для потоков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def add(self, alias, name, value=1):
+        with self._lock:
+            self._counters[alias, name] += value
+
+    def snapshot(self):
+        with self._lock:
+            counters = self._counters.copy()
+        databases = {}
+        for alias in sorted({alias for alias, _ in counters}):
+            opened = counters[alias, 'opened']
+            databases[alias] = {
+                'open': opened - counters[alias, 'closed'],
+                'opened': opened,
+                'closed': counters[alias, 'closed'],
+                'checkouts': counters[alias, 'checkouts'],
+                'reused': counters[alias, 'reused'],
+                'health_check_failures': counters[
+                    alias, 'health_check_failures'],
+                'connect_ms': round(
+                    counters[alias, 'connect_seconds'] * 1000, 1),
+            }
+        return {'pid': os.getpid(), 'databases': databases}
+
+
+stats = ConnectionStats()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянных соединений и счётчиками.
+
+    Соединение живёт CONN_MAX_AGE секунд и принадлежит потоку: у
+    синхронного воркера gunicorn одно соединение, в режиме asgi — по
+    одному на поток пула async-view. Django 3.2 не проверяет такое
+    соединение перед запросом, и после рестарта базы или PgBouncer
+    первый запрос падает. С CONN_HEALTH_CHECKS (как в Django 4.1)
+    соединение проверяется при первом обращении в каждом запросе и
+    открывается заново, если сервер его закрыл.
+    """
+
+    health_check_done = False
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        stats.add(self.alias, 'opened')
+        stats.add(
+            self.alias, 'connect_seconds', time.perf_counter() - start)
+
+    def close(self):
+        was_open = self.connection is not None
+        super().close()
+        if was_open and self.connection is None:
+            stats.add(self.alias, 'closed')
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается на границах запросов: следующее обращение — новая
+        # выдача соединения из «пула» потока.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    @async_unsafe
+    def ensure_connection(self):
+        if not self.health_check_done:
+            self.health_check_done = True
+            stats.add(self.alias, 'checkouts')
+            if self.connection is not None:
+                if (
+                    self.settings_dict.get('CONN_HEALTH_CHECKS')
+                    and not self.in_atomic_block
+                    and not self.is_usable()
+                ):
+                    stats.add(self.alias, 'health_check_failures')
+                    self.close()
+                else:
+                    stats.add(self.alias, 'reused')
+        super().ensure_connection()
@@ -0,0 +1,105 @@
+import pickle
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+
+class RedisCache(BaseCache):
+    """Бэкенд кеша Django для Redis-совместимых серверов.
+
+    Клиент задаётся опцией CLIENT_CLASS (по умолчанию redis.Redis), поэтому
+    локально вместо сервера можно подставить fakeredis.FakeRedis.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        self._server = server
+        self._options = params.get('OPTIONS', {})
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            client_class = import_string(
+                self._options.get('CLIENT_CLASS', 'redis.Redis'))
+            self._client = client_class.from_url(self._server)
+        return self._client
+
+    @staticmethod
+    def dumps(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(value):
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return None
+        return max(int(timeout), 0)
+
+    def make_and_validate_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            return False
+        return bool(self.client.set(key, self.dumps(value), ex=expiry,
+                                    nx=True))
+
+    def get(self, key, default=None, version=None):
+        value = self.client.get(self.make_and_validate_key(key, version))
+        return default if value is None else self.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([
+            self.make_and_validate_key(key, version) for key in keys])
+        return {
+            key: self.loads(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            self.client.delete(key)
+        else:
+            self.client.set(key, self.dumps(value), ex=expiry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return bool(self.client.persist(key))
+        return bool(self.client.expire(key, expiry))
+
+    def delete(self, key, version=None):
+        return bool(
+            self.client.delete(self.make_and_validate_key(key, version)))
+
+    def has_key(self, key, version=None):
+        return bool(
+            self.client.exists(self.make_and_validate_key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version)
+        if not self.client.exists(key):
+            raise ValueError(f"Key '{key}' not found.")
+        return self.client.incr(key, delta)
+
+    def clear(self):
+        self.client.flushdb()
@@ -0,0 +1,98 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.permissions import SAFE_METHODS
+
+# База для чтения в текущем запросе. Вне запросов (команды, shell)
+# читается основная база.
+read_alias = ContextVar('read_alias', default=DEFAULT_DB_ALIAS)
+
+
+def uses_replicas():
+    return bool(settings.DATABASE_REPLICAS)
+
+
+def pin_primary():
+    """До конца запроса читать с основной базы."""
+    read_alias.set(DEFAULT_DB_ALIAS)
+
+
+class ReplicaRouter:
+    """Чтение с реплики, выбранной на запрос, запись в основную базу.
+
+    Токены всегда читаются с основной базы: только что выданный токен
+    должен сразу работать, а удалённый при выходе — сразу перестать.
+    """
+
+    primary_apps = ('authtoken',)
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.primary_apps:
+            return DEFAULT_DB_ALIAS
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def choose_read_alias(request):
+    """Реплика для безопасных запросов без метки недавней записи.
+
+    Одна реплика на весь запрос: ETag и тело ответа читаются из одного
+    снимка данных.
+    """
+    if (
+        not settings.DATABASE_REPLICAS
+        or request.method not in SAFE_METHODS
+        or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+    ):
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def mark_write(request, response):
+    """После записи клиент REPLICA_MAX_LAG секунд читает с основной базы.
+
+    Реплика отстаёт, и без метки автор сразу после сохранения мог бы
+    получить рецепт в старом виде.
+    """
+    if (
+        settings.DATABASE_REPLICAS
+        and request.method not in SAFE_METHODS
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE, '1',
+            max_age=settings.REPLICA_MAX_LAG, httponly=True, samesite='Lax')
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = read_alias.set(choose_read_alias(request))
+            try:
+                response = await get_response(request)
+            finally:
+                read_alias.reset(token)
+            return mark_write(request, response)
+    else:
+        def middleware(request):
+            token = read_alias.set(choose_read_alias(request))
+            try:
+                response = get_response(request)
+            finally:
+                read_alias.reset(token)
+            return mark_write(request, response)
+    return middleware
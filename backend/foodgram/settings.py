@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.replicas.replica_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,17 +59,69 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Соединения постоянные: поток держит своё соединение CONN_MAX_AGE секунд
+# и проверяет его в начале запроса. За PgBouncer в режиме transaction
+# (DB_PGBOUNCER=True) серверные курсоры недоступны и отключаются.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', default='True') == 'True'),
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.getenv('DB_PGBOUNCER', default='False') == 'True'),
     }
 }
 
+# DB_ENGINE=sqlite — локальная база без PostgreSQL: поиск и индексы с
+# классами операторов заменяются запасными путями.
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+    }
+    # Покрывающие индексы (INCLUDE) SQLite строит без лишних столбцов.
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433. Безопасные
+# запросы читают с одной из них, запись и чтение REPLICA_MAX_LAG секунд
+# после своей записи идут в основную базу.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1
+):
+    replica_host, _, replica_port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=replica_host,
+        PORT=replica_port or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+REPLICA_MAX_LAG = int(os.getenv('DB_REPLICA_MAX_LAG', 5))
+REPLICA_STICKY_COOKIE = 'read_primary'
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'foodgram.redis_cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'OPTIONS': {
+                'CLIENT_CLASS': os.getenv(
+                    'REDIS_CLIENT_CLASS', 'redis.Redis'),
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -147,6 +200,39 @@ MIN_VALUE_VALIDATOR = 1
 MAX_VALUE_VALIDATOR = 10000
 ZERO_NUM = 0
 ONE_NUM = 1
+EXPORT_CHUNK_SIZE = 2000
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+INGREDIENT_CACHE_MAX_SIZE = 50000
+INGREDIENT_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_CACHE_VERSION_TIMEOUT = 60
+USER_RELATIONS_CACHE_TIMEOUT = 60 * 10
+IMAGE_PROCESS_WORKERS = int(os.getenv('IMAGE_PROCESS_WORKERS', 2))
+IMAGE_PROCESS_TIMEOUT = 60
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'WEBP')
+IMAGE_QUALITY = 85
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_LIST_WIDTH = 640
+TRENDING_WINDOW_DAYS = 14
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 0.5
+SEARCH_CONFIG = 'russian'
+SEARCH_FALLBACK_LIMIT = 1000
+RECIPE_MATCH_MAX_INGREDIENTS = 100
+RECOMMENDATION_NEIGHBOURS = 20
+RECOMMENDATION_BLOCK_SIZE = 256
+RECOMMENDATION_CART_WEIGHT = 0.5
+RECOMMENDATION_CO_WEIGHT = 1.0
+RECOMMENDATION_INGREDIENT_WEIGHT = 0.3
+RECOMMENDATION_TAG_WEIGHT = 0.1
+RECOMMENDATION_MAX_INGREDIENT_SHARE = 0.1
+RECOMMENDATION_SEED_LIMIT = 50
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+# wsgi — gunicorn с синхронными воркерами, asgi — воркеры uvicorn и
+# async-view для чтения рецептов, тегов и ингредиентов.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASGI_VIEW_THREADS = int(os.getenv('ASGI_VIEW_THREADS', 16))
 
 Host = os.getenv('HOST_NAME')
 RECIPE_LINK = f'https://{Host}/recipes'
@@ -0,0 +1,59 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.http import StreamingHttpResponse
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """Потоковый ответ, тело которого — асинхронный итератор.
+
+    ASGIHandler Django 3.2 перебирает streaming_content синхронно в цикле
+    событий, где запросы к базе запрещены; тело этого ответа отдаёт
+    StreamingASGIHandler.
+    """
+
+    def __init__(self, async_content, *args, **kwargs):
+        super().__init__((), *args, **kwargs)
+        self.async_content = async_content
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGIHandler, который отдаёт тело AsyncStreamingHttpResponse."""
+
+    async def send_response(self, response, send):
+        parts = getattr(response, 'async_content', None)
+        if parts is None:
+            return await super().send_response(response, send)
+
+        async def send_with_body(message):
+            # Тело идёт перед закрывающим сообщением, заголовки и cookie
+            # отправляет ASGIHandler.
+            if (message['type'] == 'http.response.body'
+                    and not message.get('more_body')):
+                async for part in parts:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            await send(message)
+
+        await super().send_response(response, send_with_body)
+
+
+async def iterate_in_thread(iterator, size):
+    """Перебирает синхронный итератор пачками по size в потоке запроса.
+
+    Потоковый ответ читает базу в том же потоке и соединении, что и view,
+    а в памяти одновременно не больше одной пачки.
+    """
+    next_batch = sync_to_async(
+        lambda: list(islice(iterator, size)), thread_sensitive=True)
+    while True:
+        batch = await next_batch()
+        if not batch:
+            return
+        for item in batch:
+            yield item
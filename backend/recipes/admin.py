@@ -7,6 +7,8 @@ from foodgram.settings import ONE_NUM, ZERO_NUM
 
 from .models import (FavoriteRecipe, Ingredient, IngredientRecipe, MyUser,
                      Recipe, ShoppingCart, SubscriptionUser, Tag, TagRecipe)
+from .search import update_search_index
+from .services import get_recipe_amounts, update_recipe_cart_totals
 
 admin.site.register(SubscriptionUser)
 admin.site.register(FavoriteRecipe)
@@ -19,6 +21,7 @@ admin.site.unregister([Group, TokenProxy])
 class UserAdmin(admin.ModelAdmin):
     """Админка пользователей."""
 
+    list_display = ('username', 'email', 'recipes_count', 'followers_count',)
     search_fields = ('email', 'username')
 
 
@@ -49,11 +52,21 @@ class RecipeAdmin(admin.ModelAdmin):
 
     model = Recipe
     inlines = (RecipeIngredientInline, RecipeTagInline,)
-    list_display = ('name', 'author', 'recipe_favorite',)
+    list_display = ('name', 'author', 'recipe_favorite', 'in_carts_count',)
+    list_select_related = ('author',)
     list_filter = ('tags',)
     search_fields = ('name', 'author__username',)
 
+    def save_related(self, request, form, formsets, change):
+        old_amounts = get_recipe_amounts(form.instance.id)
+        super().save_related(request, form, formsets, change)
+        update_recipe_cart_totals(
+            form.instance.id, old_amounts,
+            get_recipe_amounts(form.instance.id))
+        update_search_index([form.instance.id])
+
     @admin.display(
-        description=format_html('<strong>Рецепт в избранных</strong>'))
-    def recipe_favorite(self, Recipe):
-        return Recipe.favorite_recipe.count()
+        description=format_html('<strong>Рецепт в избранных</strong>'),
+        ordering='favorites_count')
+    def recipe_favorite(self, recipe):
+        return recipe.favorites_count
@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from .importers import batched
+from .models import IngredientRecipe, Recipe, TagRecipe
+
+RECIPE_FIELDS = (
+    'id', 'author', 'name', 'text', 'cooking_time', 'pub_date', 'image',
+    'favorites_count', 'tags', 'ingredients',
+)
+
+
+def _group(rows):
+    grouped = defaultdict(list)
+    for recipe_id, *value in rows:
+        grouped[recipe_id].append(value)
+    return grouped
+
+
+def iter_recipe_records(queryset=None, chunk_size=2000):
+    """Отдаёт рецепты словарями в формате import_data.
+
+    Рецепты читаются серверным курсором через iterator(). В Django 3.2
+    prefetch_related с iterator() не работает, поэтому теги и ингредиенты
+    подгружаются отдельными запросами на каждую пачку: в памяти
+    одновременно только одна пачка.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    recipes = queryset.select_related('author').order_by('pk').values_list(
+        'id', 'author__username', 'name', 'text', 'cooking_time',
+        'pub_date', 'image', 'favorites_count',
+    ).iterator(chunk_size=chunk_size)
+    for batch in batched(recipes, chunk_size):
+        ids = [row[0] for row in batch]
+        tags = _group(TagRecipe.objects.filter(
+            recipe__in=ids).values_list('recipe_id', 'tag__slug'))
+        ingredients = _group(IngredientRecipe.objects.filter(
+            recipe__in=ids).values_list(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'))
+        for (recipe_id, author, name, text, cooking_time, pub_date,
+             image, favorites_count) in batch:
+            yield {
+                'id': recipe_id,
+                'author': author,
+                'name': name,
+                'text': text,
+                'cooking_time': cooking_time,
+                'pub_date': pub_date.isoformat(),
+                'image': image,
+                'favorites_count': favorites_count,
+                'tags': sorted(slug for slug, in tags[recipe_id]),
+                'ingredients': [
+                    {'name': ingredient, 'measurement_unit': unit,
+                     'amount': amount}
+                    for ingredient, unit, amount in ingredients[recipe_id]
+                ],
+            }
@@ -0,0 +1,109 @@
+from django.db import connection, transaction
+from django.db.models import Q
+
+from foodgram.settings import FEED_FANOUT_MAX_FOLLOWERS
+
+from .models import FeedEntry, MyUser, Recipe, SubscriptionUser
+
+# Рецепты авторов с подписчиками не больше порога — в ленты подписчиков.
+FAN_OUT = '''
+    INSERT INTO {feed} (user_id, recipe_id, author_id, pub_date)
+    SELECT subscription.user_id, recipe.id, recipe.author_id, recipe.pub_date
+    FROM {recipe} AS recipe
+    JOIN {subscription} AS subscription
+        ON subscription.author_id = recipe.author_id
+    JOIN {user} AS author ON author.id = recipe.author_id
+    WHERE author.followers_count <= %s AND {condition}
+    ON CONFLICT DO NOTHING
+'''
+
+
+def _fan_out(condition, params):
+    sql = FAN_OUT.format(
+        feed=FeedEntry._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        subscription=SubscriptionUser._meta.db_table,
+        user=MyUser._meta.db_table,
+        condition=condition,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [FEED_FANOUT_MAX_FOLLOWERS, *params])
+        return cursor.rowcount
+
+
+def fan_out_recipes(recipe_ids):
+    """Добавляет новые рецепты в ленты подписчиков их авторов."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    return _fan_out(f'recipe.id IN ({placeholders})', recipe_ids)
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавляет в ленту рецепты автора, на которого подписался user."""
+    return _fan_out(
+        'subscription.user_id = %s AND recipe.author_id = %s',
+        [user_id, author_id])
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def switch_fan_out(author_id, before, after):
+    """Переводит автора между fan-out on write и on read.
+
+    Вызывается, когда число подписчиков меняется с before на after.
+    Автор, перешедший порог FEED_FANOUT_MAX_FOLLOWERS, читается из Recipe,
+    и его записи удаляются из лент. Автор, опустившийся до порога, снова
+    раскладывается по лентам всех подписчиков, в том числе подписавшихся,
+    пока записи в ленты не писались.
+    """
+    was_fanned_out = before <= FEED_FANOUT_MAX_FOLLOWERS
+    is_fanned_out = after <= FEED_FANOUT_MAX_FOLLOWERS
+    if was_fanned_out and not is_fanned_out:
+        FeedEntry.objects.filter(author_id=author_id).delete()
+    elif is_fanned_out and not was_fanned_out:
+        _fan_out('recipe.author_id = %s', [author_id])
+
+
+def rebuild_feeds():
+    """Пересобирает все ленты заново, возвращает число записей."""
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        return _fan_out('1 = 1', [])
+
+
+def _before(date_field, id_field, after):
+    """Строки строго после after в порядке (-date_field, -id_field)."""
+    pub_date, pk = after
+    return Q(**{f'{date_field}__lte': pub_date}) & (
+        Q(**{f'{date_field}__lt': pub_date})
+        | Q(**{date_field: pub_date, f'{id_field}__lt': pk})
+    )
+
+
+def get_feed_page(user, after=None, limit=None):
+    """Пары (pub_date, id) рецептов подписок по убыванию.
+
+    Рецепты обычных авторов записываются в FeedEntry при публикации
+    (fan-out on write). У авторов, где подписчиков больше
+    FEED_FANOUT_MAX_FOLLOWERS, запись в ленты каждого подписчика дорога,
+    поэтому их рецепты читаются из Recipe при запросе (fan-out on read).
+    Обе выборки идут по индексу, берут не больше limit строк и
+    сливаются; повторы после смены статуса автора отбрасываются.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    celebrities = Recipe.objects.filter(
+        author__in=SubscriptionUser.objects.filter(
+            user=user, author__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS,
+        ).values('author'))
+    if after is not None:
+        entries = entries.filter(_before('pub_date', 'recipe_id', after))
+        celebrities = celebrities.filter(_before('pub_date', 'id', after))
+    rows = set(entries.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id')[:limit])
+    rows.update(celebrities.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id')[:limit])
+    return sorted(rows, reverse=True)[:limit]
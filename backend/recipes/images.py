@@ -0,0 +1,223 @@
+import base64
+import binascii
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from foodgram.settings import (IMAGE_FORMAT, IMAGE_PROCESS_TIMEOUT,
+                               IMAGE_PROCESS_WORKERS, IMAGE_QUALITY,
+                               IMAGE_VARIANT_WIDTHS)
+
+BASE64_CHUNK_SIZE = 64 * 1024
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+WHITESPACE = re.compile(r'\s+')
+# Сборки Pillow без libwebp сохраняют изображения в JPEG.
+OUTPUT_FORMAT = (
+    'JPEG' if IMAGE_FORMAT == 'WEBP' and not features.check('webp')
+    else IMAGE_FORMAT
+)
+
+
+class InvalidImage(Exception):
+    """Файл не удалось прочитать как изображение."""
+
+
+def decode_base64(data):
+    """Декодирует base64 по частям во временный файл и считает sha256."""
+    if WHITESPACE.search(data):
+        data = WHITESPACE.sub('', data)
+    digest = hashlib.sha256()
+    decoded = tempfile.NamedTemporaryFile(suffix='.upload')
+    try:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                data[start:start + BASE64_CHUNK_SIZE], validate=True)
+            digest.update(chunk)
+            decoded.write(chunk)
+    except (binascii.Error, ValueError):
+        decoded.close()
+        raise InvalidImage
+    decoded.flush()
+    return decoded, digest.hexdigest()
+
+
+def _encode(image, image_format, quality):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def process_image(path, widths, image_format, quality, keep_original=True):
+    """Проверяет, поворачивает по EXIF и перекодирует изображение.
+
+    Выполняется в отдельном процессе. Метаданные не переносятся в
+    результат. Возвращает байты оригинала (None при keep_original=False)
+    и уменьшенных копий вместе с их размерами.
+    """
+    try:
+        with Image.open(path) as source:
+            source.verify()
+        with Image.open(path) as source:
+            image = ImageOps.exif_transpose(source)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert(
+                    'RGBA' if 'transparency' in image.info else 'RGB')
+            image.load()
+    except (OSError, SyntaxError, ValueError,
+            Image.DecompressionBombError) as error:
+        raise InvalidImage from error
+    original = (
+        (_encode(image, image_format, quality), *image.size)
+        if keep_original else None
+    )
+    variants = []
+    for width in widths:
+        # Копии не увеличиваются: для узких изображений это оригинал.
+        size = (
+            (width, max(1, round(image.height * width / image.width)))
+            if width < image.width else image.size
+        )
+        variant = image.resize(size, Image.LANCZOS)
+        variants.append(
+            (width, _encode(variant, image_format, quality), *size))
+    return original, variants
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def create_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = create_executor(IMAGE_PROCESS_WORKERS)
+    return _executor
+
+
+def reset_executor(broken):
+    """Убирает сломанный пул, если другой поток ещё не заменил его."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+
+def submit_process_image(arguments):
+    executor = get_executor()
+    try:
+        return executor.submit(process_image, *arguments).result(
+            timeout=IMAGE_PROCESS_TIMEOUT)
+    except BrokenProcessPool:
+        # Процесс пула завершился аварийно (например, по OOM), и пул
+        # больше не принимает задачи: следующая создаст новый.
+        reset_executor(executor)
+        raise
+
+
+def run_process_image(path):
+    """Обрабатывает изображение в пуле, при сломанном пуле — ещё раз."""
+    arguments = (path, IMAGE_VARIANT_WIDTHS, OUTPUT_FORMAT, IMAGE_QUALITY)
+    if not IMAGE_PROCESS_WORKERS:
+        return process_image(*arguments)
+    try:
+        return submit_process_image(arguments)
+    except BrokenProcessPool:
+        return submit_process_image(arguments)
+
+
+def image_name(directory, digest):
+    return f'{directory}/{digest}.{EXTENSIONS[OUTPUT_FORMAT]}'
+
+
+def variant_name(name, width):
+    stem = os.path.splitext(name)[0]
+    return f'{stem}_{width}.{EXTENSIONS[OUTPUT_FORMAT]}'
+
+
+def save_variants(name, variants):
+    """Сохраняет уменьшенные копии рядом с оригиналом.
+
+    Возвращает словарь для полей *_variants: ширина копии в виде строки
+    (ключи JSON) и имя файла с фактическими размерами.
+    """
+    stored = {}
+    for width, content, real_width, height in variants:
+        path = variant_name(name, width)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        stored[str(width)] = {
+            'name': default_storage.save(path, ContentFile(content)),
+            'width': real_width,
+            'height': height,
+        }
+    return stored
+
+
+def read_variants(name):
+    """Собирает описание уже сохранённых копий без их обработки."""
+    stored = {}
+    for width in IMAGE_VARIANT_WIDTHS:
+        path = variant_name(name, width)
+        if not default_storage.exists(path):
+            return None
+        with default_storage.open(path) as file, Image.open(file) as image:
+            real_width, height = image.size
+        stored[str(width)] = {
+            'name': path, 'width': real_width, 'height': height}
+    return stored
+
+
+@contextmanager
+def stored_copy(name):
+    """Копирует файл из хранилища во временный файл для пула процессов."""
+    with default_storage.open(name) as source, tempfile.NamedTemporaryFile(
+        suffix=os.path.splitext(name)[1]
+    ) as copy:
+        for chunk in source.chunks():
+            copy.write(chunk)
+        copy.flush()
+        yield copy.name
+
+
+def save_base64_image(data, directory):
+    """Сохраняет изображение под именем из хеша содержимого.
+
+    Повторная загрузка того же файла не обрабатывается и не пишется на
+    диск заново: возвращается уже сохранённое имя. Вторым значением
+    возвращается описание уменьшенных копий.
+    """
+    decoded, digest = decode_base64(data)
+    with decoded:
+        name = image_name(directory, digest)
+        if default_storage.exists(name):
+            variants = read_variants(name)
+            if variants is not None:
+                return name, variants
+        original, variants = run_process_image(decoded.name)
+    variants = save_variants(name, variants)
+    if default_storage.exists(name):
+        return name, variants
+    return default_storage.save(name, ContentFile(original[0])), variants
@@ -0,0 +1,441 @@
+import csv
+import gzip
+import io
+import json
+import os
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from django.db import connection, connections, transaction
+
+from .feeds import fan_out_recipes
+from .models import (Ingredient, IngredientRecipe, MyUser, Recipe, Tag,
+                     TagRecipe)
+from .search import update_search_index
+from .services import change_counter, refresh_ingredient_copies
+
+READ_CHUNK_SIZE = 64 * 1024
+FORMATS = {
+    '.csv': 'csv', '.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+# on_update получает id изменённых строк: пакетная запись не отправляет
+# сигналы, которые обновили бы копии данных в других таблицах.
+Dataset = namedtuple(
+    'Dataset', ('model', 'fields', 'unique_fields', 'on_update'),
+    defaults=(None,))
+
+DATASETS = {
+    'ingredients': Dataset(Ingredient, ('name', 'measurement_unit'),
+                           ('name',), refresh_ingredient_copies),
+    'tags': Dataset(Tag, ('name', 'slug'), ('slug',)),
+}
+
+
+class InvalidData(Exception):
+    """Файл не удалось разобрать."""
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in FORMATS:
+        raise InvalidData(f'Неизвестный формат файла: {path}')
+    return FORMATS[extension]
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_json_array(file):
+    """Читает элементы JSON-массива по одному, не загружая весь файл."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise InvalidData('Ожидается JSON-массив.')
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as error:
+            if eof:
+                raise InvalidData(f'Некорректный JSON: {error}')
+            end = None
+        if end is None or (end == len(buffer) and not eof):
+            # Элемент мог оборваться на границе блока.
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_records(file, data_format, fieldnames=None):
+    """Потоково отдаёт записи файла CSV, JSON или JSONL словарями.
+
+    Для CSV без заголовка колонки берутся из fieldnames, строка,
+    совпадающая с fieldnames, считается заголовком и пропускается.
+    """
+    if data_format == 'csv':
+        reader = csv.DictReader(file, fieldnames=fieldnames)
+        for row in reader:
+            if fieldnames and list(row.values()) == list(fieldnames):
+                continue
+            yield row
+    elif data_format == 'json':
+        yield from iter_json_array(file)
+    else:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise InvalidData(f'Строка {number}: {error}')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def clean_rows(records, dataset):
+    """Оставляет нужные поля, обрезает пробелы и пропускает пустые."""
+    for record in records:
+        row = {
+            field: str(record.get(field) or '').strip()
+            for field in dataset.fields
+        }
+        if all(row[field] for field in dataset.unique_fields):
+            yield row
+
+
+class CopyStream(io.TextIOBase):
+    """Отдаёт строки в текстовом формате COPY по мере чтения."""
+
+    def __init__(self, rows, fields, progress=None):
+        self.rows = iter(rows)
+        self.fields = fields
+        self.progress = progress
+        self.count = 0
+        self.buffer = ''
+
+    @staticmethod
+    def escape(value):
+        if value is None:
+            return '\\N'
+        return str(value).replace('\\', '\\\\').replace(
+            '\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        lines = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            line = '\t'.join(
+                self.escape(row[field]) for field in self.fields) + '\n'
+            lines.append(line)
+            length += len(line)
+            self.count += 1
+            if self.progress:
+                self.progress(self.count)
+        data = ''.join(lines)
+        if size < 0:
+            self.buffer = ''
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+
+def conflict_clause(dataset, update):
+    if not update:
+        return 'ON CONFLICT DO NOTHING'
+    table = dataset.model._meta.db_table
+    unique = ', '.join(dataset.unique_fields)
+    fields = [
+        field for field in dataset.fields
+        if field not in dataset.unique_fields]
+    assignments = ', '.join(f'{field} = EXCLUDED.{field}' for field in fields)
+    distinct = (
+        'IS DISTINCT FROM' if connection.vendor == 'postgresql' else 'IS NOT')
+    # Совпадающие строки не перезаписываются и не попадают в RETURNING.
+    changed = ' OR '.join(
+        f'{table}.{field} {distinct} EXCLUDED.{field}' for field in fields)
+    return (
+        f'ON CONFLICT ({unique}) DO UPDATE SET {assignments} '
+        f'WHERE {changed}')
+
+
+def changed_ids(dataset, batch):
+    """id уже записанных строк пачки, которые импорт изменит."""
+    key_field = dataset.unique_fields[0]
+    rows = {row[key_field]: row for row in batch}
+    existing = dataset.model.objects.filter(
+        **{f'{key_field}__in': list(rows)}).values('pk', *dataset.fields)
+    return [
+        current['pk'] for current in existing
+        if any(
+            current[field] != rows[current[key_field]][field]
+            for field in dataset.fields)
+    ]
+
+
+def copy_rows(dataset, rows, update, progress=None):
+    """COPY во временную таблицу и INSERT ... ON CONFLICT в целевую."""
+    table = dataset.model._meta.db_table
+    temporary = f'import_{table}'
+    columns = ', '.join(dataset.fields)
+    unique = ', '.join(dataset.unique_fields)
+    stream = CopyStream(rows, dataset.fields, progress)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE {temporary} ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {table} WITH NO DATA')
+        cursor.copy_expert(
+            f'COPY {temporary} ({columns}) FROM STDIN', stream)
+        returning = ' RETURNING id' if update and dataset.on_update else ''
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT DISTINCT ON ({unique}) {columns} FROM {temporary} '
+            f'{conflict_clause(dataset, update)}{returning}')
+        changed = cursor.rowcount
+        if returning:
+            # Вместе с изменёнными возвращаются и новые строки, копий у
+            # них ещё нет.
+            dataset.on_update([pk for pk, in cursor.fetchall()])
+        # ON COMMIT DROP не сработает, если импорт идёт во внешней
+        # транзакции, а следующий импорт создаст таблицу заново.
+        cursor.execute(f'DROP TABLE {temporary}')
+        return stream.count, changed
+
+
+def insert_rows(dataset, rows, update, batch_size, progress=None):
+    """INSERT ... ON CONFLICT через executemany для SQLite.
+
+    Создание моделей и компиляция SQL в bulk_create на миллионе строк
+    занимают больше времени, чем сама запись.
+    """
+    table = dataset.model._meta.db_table
+    columns = ', '.join(dataset.fields)
+    placeholders = ', '.join(['%s'] * len(dataset.fields))
+    sql = (
+        f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+        f'{conflict_clause(dataset, update)}'
+    )
+    processed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in batched(rows, batch_size):
+            changed = (
+                changed_ids(dataset, batch)
+                if update and dataset.on_update else None)
+            cursor.executemany(sql, [
+                [row[field] for field in dataset.fields] for row in batch])
+            if changed:
+                dataset.on_update(changed)
+            processed += len(batch)
+            if progress:
+                progress(processed)
+    return processed, None
+
+
+def bulk_rows(dataset, rows, update, batch_size, progress=None):
+    """Пакетная запись через ORM для остальных баз.
+
+    update_conflicts в bulk_create появился в Django 4.1, поэтому
+    обновление существующих строк делается отдельным bulk_update.
+    """
+    model = dataset.model
+    key_field = dataset.unique_fields[0]
+    update_fields = [
+        field for field in dataset.fields
+        if field not in dataset.unique_fields]
+    processed = 0
+    for batch in batched(rows, batch_size):
+        processed += len(batch)
+        objects = {
+            row[key_field]: model(**row) for row in batch}
+        with transaction.atomic():
+            changed = None
+            if update and update_fields:
+                if dataset.on_update:
+                    changed = changed_ids(dataset, batch)
+                existing = model.objects.in_bulk(
+                    list(objects), field_name=key_field)
+                for key, current in existing.items():
+                    for field in update_fields:
+                        setattr(current, field, getattr(objects[key], field))
+                    del objects[key]
+                model.objects.bulk_update(existing.values(), update_fields)
+            model.objects.bulk_create(
+                objects.values(), ignore_conflicts=True)
+            if changed:
+                dataset.on_update(changed)
+        if progress:
+            progress(processed)
+    return processed, None
+
+
+def import_rows(dataset, records, update=False, batch_size=5000,
+                progress=None):
+    """Идемпотентно загружает справочник.
+
+    Возвращает число прочитанных строк и число добавленных или
+    обновлённых (None, если база его не сообщает).
+    """
+    rows = clean_rows(records, dataset)
+    if connection.vendor == 'postgresql':
+        return copy_rows(dataset, rows, update, progress)
+    if connection.vendor == 'sqlite':
+        return insert_rows(dataset, rows, update, batch_size, progress)
+    return bulk_rows(dataset, rows, update, batch_size, progress)
+
+
+def _lookup(model, field, values):
+    return dict(model.objects.filter(
+        **{f'{field}__in': values}).values_list(field, 'id'))
+
+
+def _list_field(record, field):
+    """Список из записи; в CSV списки хранятся строкой JSON."""
+    value = record.get(field) or []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+def _recipe_links(record, authors, tags, ingredients):
+    """Разбирает запись рецепта, None для неполных и неизвестных данных."""
+    author_id = authors.get(record.get('author'))
+    tag_ids = {tags.get(slug) for slug in _list_field(record, 'tags')}
+    amounts = {}
+    try:
+        cooking_time = int(record['cooking_time'])
+        for item in _list_field(record, 'ingredients'):
+            ingredient_id = ingredients.get(item.get('name'))
+            amounts[ingredient_id] = (
+                amounts.get(ingredient_id, 0) + int(item['amount']))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if (author_id is None or not record.get('name') or None in tag_ids
+            or not amounts or None in amounts):
+        return None
+    recipe = Recipe(
+        author_id=author_id,
+        name=record['name'],
+        text=record.get('text', ''),
+        cooking_time=cooking_time,
+        image=record.get('image', ''),
+    )
+    return recipe, tag_ids, amounts
+
+
+def import_recipe_chunk(records):
+    """Загружает пачку рецептов с тегами и ингредиентами.
+
+    Рецепт с тем же названием у того же автора уже считается загруженным.
+    Записи с неизвестным автором, тегом или ингредиентом пропускаются.
+    Строки авторов блокируются до проверки: пачки с общими авторами
+    проверяют и пишут рецепты по очереди, и дубликат не появится.
+    """
+    try:
+        authors = _lookup(
+            MyUser, 'username', {record.get('author') for record in records})
+        tags = _lookup(Tag, 'slug', {
+            slug for record in records
+            for slug in _list_field(record, 'tags')})
+        ingredients = _lookup(Ingredient, 'name', {
+            item.get('name') for record in records
+            for item in _list_field(record, 'ingredients')})
+        with transaction.atomic():
+            # Авторы по порядку id: параллельные пачки блокируют их
+            # строки в одной последовательности и не ждут друг друга.
+            list(MyUser.objects.select_for_update().filter(
+                pk__in=authors.values()).order_by('pk').values_list('pk'))
+            existing = set(Recipe.objects.filter(
+                author__in=authors.values(),
+                name__in={record.get('name') for record in records},
+            ).values_list('author_id', 'name'))
+            links = []
+            for record in records:
+                parsed = _recipe_links(record, authors, tags, ingredients)
+                if parsed is None:
+                    continue
+                key = (parsed[0].author_id, parsed[0].name)
+                if key not in existing:
+                    existing.add(key)
+                    links.append(parsed)
+            recipes = [recipe for recipe, _, _ in links]
+            if connection.features.can_return_rows_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+                # bulk_create не отправляет сигналы счётчиков и ленты.
+                for author_id, total in sorted(Counter(
+                    recipe.author_id for recipe in recipes
+                ).items()):
+                    change_counter(Recipe, author_id, total)
+                fan_out_recipes([recipe.id for recipe in recipes])
+            else:
+                for recipe in recipes:
+                    recipe.save()
+            TagRecipe.objects.bulk_create(
+                TagRecipe(recipe=recipe, tag_id=tag_id)
+                for recipe, tag_ids, _ in links
+                for tag_id in tag_ids
+            )
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+                for recipe, _, amounts in links
+                for ingredient_id, amount in amounts.items()
+            )
+            update_search_index([recipe.id for recipe in recipes])
+        return len(records), len(recipes)
+    finally:
+        # Соединения рабочих потоков не переиспользуются Django.
+        connections.close_all()
+
+
+def import_recipes(records, batch_size=500, workers=4, progress=None):
+    """Загружает рецепты пачками в нескольких потоках.
+
+    В памяти одновременно не больше workers * 2 пачек. У SQLite один
+    писатель, поэтому там пачки записываются по очереди.
+    """
+    if connection.vendor == 'sqlite':
+        workers = 1
+    processed = created = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        batches = batched(records, batch_size)
+        while True:
+            for batch in islice(batches, workers * 2 - len(pending)):
+                pending.add(executor.submit(import_recipe_chunk, batch))
+            if not pending:
+                return processed, created
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_processed, chunk_created = future.result()
+                processed += chunk_processed
+                created += chunk_created
+            if progress:
+                progress(processed)
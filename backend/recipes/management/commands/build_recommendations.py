@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.settings import RECOMMENDATION_BLOCK_SIZE
+from recipes.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитывает похожие рецепты по избранному, корзинам, тегам и '
+        'ингредиентам. По умолчанию пересчитывает только рецепты, '
+        'изменившиеся с прошлого запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, а не только изменившиеся.')
+        parser.add_argument(
+            '--block-size', type=int, default=RECOMMENDATION_BLOCK_SIZE,
+            help='Сколько рецептов считается одной матричной операцией.')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        done = build_recommendations(
+            full=options['full'], block_size=options['block_size'],
+            progress=lambda done: self.stdout.write(
+                f'Рассчитано рецептов: {done}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done} рецептов за '
+            f'{time.monotonic() - start:.1f} с.'))
@@ -0,0 +1,84 @@
+import csv
+import gzip
+import io
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from foodgram.settings import EXPORT_CHUNK_SIZE
+from recipes.exporters import RECIPE_FIELDS, iter_recipe_records
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты с тегами, ингредиентами, авторами и числом '
+        'добавлений в избранное в JSONL или CSV. Файл можно загрузить '
+        'обратно через import_data --dataset recipes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl',
+            dest='data_format', help='Формат выгрузки.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать выгрузку, включается сам для файлов .gz.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Сколько рецептов читается за раз.')
+        parser.add_argument(
+            '--author', action='append', dest='authors',
+            help='Выгрузить рецепты только указанных авторов (username).')
+
+    def open_output(self, path, compress):
+        if path == '-':
+            if not compress:
+                return io.TextIOWrapper(
+                    sys.stdout.buffer, encoding='utf-8', newline='')
+            return io.TextIOWrapper(
+                gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'),
+                encoding='utf-8', newline='')
+        if compress:
+            return gzip.open(path, 'wt', encoding='utf-8', newline='')
+        return open(path, 'w', encoding='utf-8', newline='')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all()
+        if options['authors']:
+            queryset = queryset.filter(author__username__in=options['authors'])
+        records = iter_recipe_records(queryset, options['chunk_size'])
+        path = options['output']
+        compress = options['gzip'] or path.endswith('.gz')
+        output = self.open_output(path, compress)
+        count = 0
+        try:
+            if options['data_format'] == 'csv':
+                writer = csv.DictWriter(output, fieldnames=RECIPE_FIELDS)
+                writer.writeheader()
+                for record in records:
+                    record['tags'] = json.dumps(
+                        record['tags'], ensure_ascii=False)
+                    record['ingredients'] = json.dumps(
+                        record['ingredients'], ensure_ascii=False)
+                    writer.writerow(record)
+                    count += 1
+            else:
+                for record in records:
+                    output.write(json.dumps(record, ensure_ascii=False))
+                    output.write('\n')
+                    count += 1
+        finally:
+            if path == '-' and not compress:
+                # sys.stdout закрывать нельзя.
+                output.flush()
+                output.detach()
+            else:
+                output.close()
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено рецептов: {count}.'))
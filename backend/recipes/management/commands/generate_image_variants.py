@@ -0,0 +1,96 @@
+import os
+from concurrent.futures import as_completed
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_version
+from foodgram.settings import IMAGE_QUALITY, IMAGE_VARIANT_WIDTHS
+from recipes.images import (OUTPUT_FORMAT, InvalidImage, create_executor,
+                            process_image, save_variants, stored_copy)
+from recipes.models import MyUser, Recipe
+
+BATCH_SIZE = 100
+# Модель, поле изображения, поле копий, пространство версий кеша.
+TARGETS = (
+    (Recipe, 'image', 'image_variants', 'recipes'),
+    (MyUser, 'avatar', 'avatar_variants', 'users'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии изображений рецептов и аватаров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии и для записей, где они уже есть.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Количество процессов для обработки изображений.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько записей обрабатывается за один проход.')
+
+    def handle(self, *args, **options):
+        with create_executor(options['workers']) as executor:
+            for model, field, variants_field, namespace in TARGETS:
+                done, failed = self.backfill(
+                    executor, model, field, variants_field, options)
+                if done:
+                    # bulk_update не вызывает сигналы: кешированные
+                    # списки и ETag сбрасываются здесь.
+                    bump_version(namespace)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model._meta.verbose_name_plural}: обработано {done},'
+                    f' с ошибками {failed}.'))
+
+    def backfill(self, executor, model, field, variants_field, options):
+        queryset = model.objects.exclude(**{field: ''}).order_by('pk')
+        if not options['force']:
+            queryset = queryset.filter(**{variants_field: {}})
+        done = failed = last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).values_list(
+                'pk', field)[:options['batch_size']])
+            if not batch:
+                return done, failed
+            last_pk = batch[-1][0]
+            # Один файл может принадлежать нескольким записям.
+            names = {}
+            for pk, name in batch:
+                names.setdefault(name, []).append(pk)
+            updated = []
+            for name, variants in self.process(executor, names):
+                if variants is None:
+                    failed += len(names[name])
+                    continue
+                updated.extend(
+                    model(pk=pk, **{variants_field: variants})
+                    for pk in names[name])
+            model.objects.bulk_update(updated, (variants_field,))
+            done += len(updated)
+
+    def process(self, executor, names):
+        with ExitStack() as stack:
+            futures = {}
+            for name in names:
+                try:
+                    path = stack.enter_context(stored_copy(name))
+                except OSError as error:
+                    self.stderr.write(f'{name}: {error}')
+                    yield name, None
+                    continue
+                futures[executor.submit(
+                    process_image, path, IMAGE_VARIANT_WIDTHS,
+                    OUTPUT_FORMAT, IMAGE_QUALITY, False,
+                )] = name
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    _, variants = future.result()
+                except InvalidImage:
+                    self.stderr.write(f'{name}: не изображение')
+                    yield name, None
+                    continue
+                yield name, save_variants(name, variants)
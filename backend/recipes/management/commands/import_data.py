@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import bump_version
+from recipes.importers import (DATASETS, InvalidData, detect_format,
+                               import_recipes, import_rows, open_text,
+                               read_records)
+
+PROGRESS_INTERVAL = 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты, теги или рецепты из CSV, JSON или JSONL. '
+        'Повторная загрузка того же файла ничего не дублирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу, можно .gz.')
+        parser.add_argument(
+            '--dataset', choices=(*DATASETS, 'recipes'),
+            default='ingredients', help='Что загружать.')
+        parser.add_argument(
+            '--format', choices=('csv', 'json', 'jsonl'), dest='data_format',
+            help='Формат файла, по умолчанию по расширению.')
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновлять уже существующие записи справочника.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пачки для bulk_create и рецептов.')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Потоков для загрузки рецептов.')
+
+    def handle(self, *args, **options):
+        path, dataset = options['path'], options['dataset']
+        progress = self.progress_reporter()
+        try:
+            data_format = options['data_format'] or detect_format(path)
+            with open_text(path) as file:
+                fieldnames = (
+                    DATASETS[dataset].fields
+                    if dataset in DATASETS and data_format == 'csv' else None
+                )
+                records = read_records(file, data_format, fieldnames)
+                if dataset == 'recipes':
+                    processed, changed = import_recipes(
+                        records, batch_size=options['batch_size'],
+                        workers=options['workers'], progress=progress)
+                else:
+                    processed, changed = import_rows(
+                        DATASETS[dataset], records, update=options['update'],
+                        batch_size=options['batch_size'], progress=progress)
+        except (InvalidData, OSError) as error:
+            raise CommandError(error)
+        # Пакетная запись не отправляет сигналы, кеш сбрасывается здесь.
+        bump_version('recipes' if dataset == 'recipes' else dataset)
+        message = f'Прочитано записей: {processed}.'
+        if changed is not None:
+            message += f' Добавлено или обновлено: {changed}.'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def progress_reporter(self):
+        last = time.monotonic()
+
+        def report(count):
+            nonlocal last
+            now = time.monotonic()
+            if now - last >= PROGRESS_INTERVAL:
+                last = now
+                self.stdout.write(f'Обработано записей: {count}')
+        return report
@@ -1,22 +1,16 @@
-import csv
-
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
-from recipes.models import Ingredient
-
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из data/ingredients.csv.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='data/ingredients.csv',
+            help='Путь к файлу с ингредиентами (CSV, JSON или JSONL).')
+
     def handle(self, *args, **options):
-        with open(
-            'data/ingredients.csv', 'r', encoding='utf-8'
-        ) as f:
-            reader = csv.reader(f, delimiter=',')
-            ingredients = []
-            for row in reader:
-                name, measurement_unit = row
-                if name:
-                    ingredient = Ingredient(
-                        name=name, measurement_unit=measurement_unit
-                    )
-                    ingredients.append(ingredient)
-            Ingredient.objects.bulk_create(ingredients)
+        call_command(
+            'import_data', options['path'], dataset='ingredients',
+            stdout=self.stdout, stderr=self.stderr)
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+from recipes.services import get_live_cart_totals
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или проверяет суммы ингредиентов в списках покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить таблицу с пересчётом по рецептам.')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Ограничить пользователями с указанными id.')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        live = {
+            (row['recipe__cart_recipe__user'], row['ingredient']): row
+            for row in get_live_cart_totals(users)
+        }
+        if options['verify']:
+            return self.verify(live, users)
+        totals = ShoppingCartIngredient.objects.all()
+        if users:
+            totals = totals.filter(user__in=users)
+        with transaction.atomic():
+            totals.delete()
+            ShoppingCartIngredient.objects.bulk_create(
+                (
+                    ShoppingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        name=row['ingredient__name'],
+                        measurement_unit=row['ingredient__measurement_unit'],
+                        amount=row['total'],
+                    )
+                    for (user_id, ingredient_id), row in live.items()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано строк: {len(live)}.'))
+
+    def verify(self, live, users):
+        totals = ShoppingCartIngredient.objects.all()
+        if users:
+            totals = totals.filter(user__in=users)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in totals.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()
+        }
+        mismatches = 0
+        for key in {*live, *stored}:
+            expected = live[key]['total'] if key in live else 0
+            actual = stored.get(key, 0)
+            if expected != actual:
+                mismatches += 1
+                self.stdout.write(
+                    f'user={key[0]} ingredient={key[1]}: '
+                    f'ожидалось {expected}, в таблице {actual}')
+        if mismatches:
+            raise CommandError(f'Расхождений: {mismatches}.')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feeds import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает ленты подписок. Нужна после загрузки данных в обход '
+        'сигналов и после смены FEED_FANOUT_MAX_FOLLOWERS.'
+    )
+
+    def handle(self, *args, **options):
+        total = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(f'Записей в лентах: {total}.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_index, uses_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Заполняет поисковый вектор рецептов, например после миграции.'
+
+    def handle(self, *args, **options):
+        if not uses_search_vector():
+            self.stdout.write(
+                'База без tsvector: индекс строится в памяти при поиске.')
+            return
+        update_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Переиндексировано рецептов: {Recipe.objects.count()}.'))
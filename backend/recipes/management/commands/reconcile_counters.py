@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.feeds import switch_fan_out
+from recipes.models import SubscriptionUser
+from recipes.services import COUNTERS, reconcile_counter
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики рецептов и пользователей с данными и чинит их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только показать расхождения, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        fix = not options['verify']
+        total = 0
+        for source, (model, _, field) in COUNTERS.items():
+            rows = reconcile_counter(source, fix=fix)
+            total += len(rows)
+            for pk, stored, actual in rows:
+                self.stdout.write(
+                    f'{model.__name__} id={pk} {field}: '
+                    f'в столбце {stored}, по данным {actual}')
+                if fix and source is SubscriptionUser:
+                    # Исправленный счётчик может перевести автора через
+                    # порог ленты.
+                    switch_fan_out(pk, stored, actual)
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+        elif fix:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено счётчиков: {total}.'))
+        else:
+            raise CommandError(f'Расхождений: {total}.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_version
+from recipes.services import refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг «в тренде» для ?ordering=trending. '
+        'Запускается периодически, например из cron раз в 10 минут.'
+    )
+
+    def handle(self, *args, **options):
+        changed = refresh_trending_scores()
+        bump_version('trending')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {changed}.'))
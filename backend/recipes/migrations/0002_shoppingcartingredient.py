@@ -0,0 +1,39 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, verbose_name='Название')),
+                ('measurement_unit', models.CharField(max_length=64, verbose_name='Единица измерения')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'ингредиенты в списке покупок',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcartingredient',
+            index=models.Index(fields=['user', 'name'], name='cart_ingredient_user_name_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient', 'measurement_unit'), name='unique_cart_ingredient'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from ._postgresql import RunPostgreSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppingcartingredient'),
+    ]
+
+    # name__istartswith и name__icontains в PostgreSQL сравнивают
+    # UPPER(name), поэтому индексы построены по тому же выражению.
+    # Прежние индексы с этими именами были по name и пересоздаются.
+    operations = [
+        RunPostgreSQL(
+            sql=[
+                'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+                'DROP INDEX IF EXISTS ingredient_name_prefix_idx',
+                'DROP INDEX IF EXISTS ingredient_name_trgm_idx',
+                'CREATE INDEX ingredient_name_prefix_idx '
+                'ON recipes_ingredient (UPPER(name) text_pattern_ops)',
+                'CREATE INDEX ingredient_name_trgm_idx '
+                'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops)',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS ingredient_name_prefix_idx',
+                'DROP INDEX IF EXISTS ingredient_name_trgm_idx',
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myuser',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Уменьшенные копии аватара'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Уменьшенные копии изображения'),
+        ),
+    ]
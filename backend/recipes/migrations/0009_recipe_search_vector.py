@@ -0,0 +1,26 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:29
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from ._postgresql import RunPostgreSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        RunPostgreSQL(
+            sql='CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+                'ON recipes_recipe USING gin (search_vector)',
+            reverse_sql='DROP INDEX IF EXISTS recipe_search_vector_idx',
+        ),
+    ]
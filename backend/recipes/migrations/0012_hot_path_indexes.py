@@ -0,0 +1,107 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_feedentry'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='favoriterecipe',
+            name='unique_favorite_cart_recipe',
+        ),
+        migrations.RemoveConstraint(
+            model_name='shoppingcart',
+            name='unique_shopping_cart_recipe',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipesimilarity',
+            name='recipe_similarity_score_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='shoppingcartingredient',
+            name='cart_ingredient_user_name_idx',
+        ),
+        migrations.AlterField(
+            model_name='favoriterecipe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorite_recipe', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientrecipe',
+            name='ingredient',
+            field=models.ForeignKey(db_index=False, help_text='Укажите ингредиент', on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_recipe', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcartingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='subscriptionuser',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscribed_to', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='subscriptionuser',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscriber', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AlterField(
+            model_name='tagrecipe',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='tagrecipe',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.tag', verbose_name='Тег'),
+        ),
+        migrations.AddIndex(
+            model_name='favoriterecipe',
+            index=models.Index(fields=['user', '-created_at'], include=('recipe',), name='favoriterecipe_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipesimilarity',
+            index=models.Index(fields=['recipe', '-score'], include=('similar',), name='recipe_similarity_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', '-created_at'], include=('recipe',), name='shoppingcart_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcartingredient',
+            index=models.Index(fields=['user', 'name'], include=('measurement_unit', 'amount'), name='cart_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriptionuser',
+            index=models.Index(fields=['user', 'author'], name='subscription_user_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagrecipe',
+            index=models.Index(fields=['tag', 'recipe'], name='tag_recipe_tag_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='favoriterecipe_unique_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='shoppingcart_unique_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='unique_tag_recipe'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.6 on 2026-10-18 21:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicates(apps, schema_editor):
+    """Переименовывает повторы названий у автора, кроме первого рецепта.
+
+    Без этого ограничение не создастся на базе, где повторы уже есть.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    max_length = Recipe._meta.get_field('name').max_length
+    duplicates = Recipe.objects.values('author_id', 'name').annotate(
+        total=Count('id')).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        recipes = Recipe.objects.filter(
+            author_id=duplicate['author_id'], name=duplicate['name'],
+        ).order_by('id')[1:]
+        for recipe in recipes:
+            suffix = f' ({recipe.id})'
+            recipe.name = recipe.name[:max_length - len(suffix)] + suffix
+            recipe.save(update_fields=('name',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(fields=('author', 'name'), name='unique_author_recipe_name'),
+        ),
+    ]
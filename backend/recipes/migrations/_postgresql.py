@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class RunPostgreSQL(migrations.RunSQL):
+    """RunSQL только для PostgreSQL, на остальных базах ничего не делает.
+
+    Индексы с классами операторов и GIN нельзя описать в Meta без
+    поломки SQLite, поэтому они создаются этой операцией.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
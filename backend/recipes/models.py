@@ -1,7 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from foodgram.settings import (INGREDIENT_NAME_LEN, MAX_EMAIL_LEN,
                                MAX_NAME_LEN, MAX_TAG_LEN, MAX_TEXT_LEN,
@@ -40,6 +42,21 @@ class MyUser(AbstractUser):
         upload_to='avatars',
         help_text='Добавьте ваш аватар',
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Уменьшенные копии аватара',
+        default=dict,
+        blank=True,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -55,17 +72,21 @@ class MyUser(AbstractUser):
 class SubscriptionUser(models.Model):
     """Модель подписки пользователей."""
 
+    # Отдельные индексы внешних ключей не нужны: оба поля стоят первыми
+    # в уникальном ограничении и индексе subscription_user_author_idx.
     author = models.ForeignKey(
         MyUser,
         on_delete=models.CASCADE,
         related_name='subscribed_to',
         verbose_name='Автор',
+        db_index=False,
     )
     user = models.ForeignKey(
         MyUser,
         on_delete=models.CASCADE,
         related_name='subscriber',
         verbose_name='Подписчик',
+        db_index=False,
     )
 
     class Meta:
@@ -78,6 +99,11 @@ class SubscriptionUser(models.Model):
                 check=~models.Q(author=models.F('user')),
                 name='self_subscription_constraint'
             )]
+        indexes = (
+            models.Index(
+                fields=('user', 'author',),
+                name='subscription_user_author_idx',
+            ),)
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
@@ -128,11 +154,47 @@ class Ingredient(models.Model):
             models.UniqueConstraint(
                 fields=['name', 'measurement_unit'],
                 name='unique_ingredients')]
+        # Индексы по UPPER(name) только для PostgreSQL, их создаёт
+        # миграция 0003_postgres_ingredient_indexes.
 
     def __str__(self) -> str:
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Запросы для выдачи рецептов без лишних обращений к базе."""
+
+    def with_relations(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredients',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'),
+            ),
+        )
+
+    def latest_by_authors(self, author_ids, limit=None):
+        """Последние рецепты каждого автора одним запросом."""
+        if limit is None:
+            return self.filter(author__in=author_ids).order_by(
+                'author', '-pub_date', '-id')
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return self.raw(
+            'SELECT id, author_id, name, image, image_variants,'
+            ' cooking_time FROM ('
+            '  SELECT id, author_id, name, image, image_variants,'
+            ' cooking_time,'
+            '  ROW_NUMBER() OVER ('
+            '    PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            f'  ) AS position FROM {table}'
+            f'  WHERE author_id IN ({placeholders})'
+            ') ranked WHERE position <= %s ORDER BY author_id, position',
+            [*author_ids, limit],
+        )
+
+
 class Recipe(models.Model):
     """Модель для описания рецептов."""
 
@@ -150,6 +212,11 @@ class Recipe(models.Model):
         upload_to='recipe_images/',
         help_text='Добавьте изображение блюда',
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+    )
     text = models.TextField(
         max_length=MAX_TEXT_LEN,
         verbose_name='Описание',
@@ -175,11 +242,65 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        verbose_name='Популярность за последние дни',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'рецепты'
         ordering = ('-pub_date',)
+        # GIN-индекс по search_vector создаёт миграция
+        # 0009_recipe_search_vector, только в PostgreSQL.
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id',),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id',),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-id',),
+                name='recipe_trending_idx',
+            ),
+            models.Index(
+                fields=('cooking_time', '-id',),
+                name='recipe_quick_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id',),
+                name='recipe_author_pub_date_idx',
+            ),)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('author', 'name',),
+                name='unique_author_recipe_name',
+            ),)
 
     def __str__(self) -> str:
         return self.name
@@ -188,11 +309,13 @@ class Recipe(models.Model):
 class IngredientRecipe(models.Model):
     """Модель для связи ингредиентов и рецептов."""
 
+    # Индекс ингредиента — уникальное ограничение ingredient_recipe.
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
         verbose_name='Ингредиент',
-        help_text='Укажите ингредиент'
+        help_text='Укажите ингредиент',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -228,36 +351,66 @@ class TagRecipe(models.Model):
     tag = models.ForeignKey(
         Tag,
         on_delete=models.CASCADE,
-        verbose_name='Тег',)
+        verbose_name='Тег',
+        db_index=False,)
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,)
+        on_delete=models.CASCADE,
+        db_index=False,)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'рецепты'
+        # Теги рецептов (prefetch) читаются по первому индексу, фильтр
+        # ?tags= — по второму; оба покрывают запрос целиком.
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'tag',),
+                name='unique_tag_recipe',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('tag', 'recipe',),
+                name='tag_recipe_tag_idx',
+            ),)
 
     def __str__(self) -> str:
-        return f'{self.ingredient} тег в {self.recipe}.'
+        return f'{self.tag} тег в {self.recipe}.'
 
 
 class ShoppingCartFavoriteBasemodel(models.Model):
     """Базовая модель для корзины и избранного."""
 
+    # Оба индекса с пользователем первым содержат recipe_id: фильтры
+    # ?is_favorited=, ?is_in_shopping_cart= и загрузка связей
+    # пользователя читают только индекс. Отдельный индекс user_id не нужен.
     user = models.ForeignKey(
         MyUser,
         on_delete=models.CASCADE,
-        verbose_name='Пользователь',)
+        verbose_name='Пользователь',
+        db_index=False,)
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         verbose_name='Рецепт',)
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+    )
 
     class Meta:
         abstract = True
+        indexes = (
+            models.Index(
+                fields=('created_at',), name='%(class)s_created_idx'),
+            models.Index(
+                fields=('user', '-created_at',),
+                name='%(class)s_user_time_idx',
+                include=('recipe',)),)
         constraints = [
             models.UniqueConstraint(
-                fields=('user', 'recipe'), name='unique_favorite_cart_recipe')]
+                fields=('user', 'recipe'),
+                name='%(class)s_unique_user_recipe')]
 
 
 class FavoriteRecipe(ShoppingCartFavoriteBasemodel):
@@ -282,3 +435,132 @@ class ShoppingCart(ShoppingCartFavoriteBasemodel):
 
     def __str__(self) -> str:
         return f'{self.user} добавил {self.recipe} в список покупок.'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя."""
+
+    # Выгрузка читает только индекс cart_ingredient_user_name_idx.
+    user = models.ForeignKey(
+        MyUser,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь',
+        db_index=False,)
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент',)
+    name = models.CharField(
+        max_length=INGREDIENT_NAME_LEN,
+        verbose_name='Название',
+    )
+    measurement_unit = models.CharField(
+        max_length=MEASURMENT_UNIT_LEN,
+        verbose_name='Единица измерения',
+    )
+    amount = models.IntegerField(verbose_name='Количество',)
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'ингредиенты в списке покупок'
+        ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient', 'measurement_unit',),
+                name='unique_cart_ingredient',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('user', 'name',),
+                name='cart_ingredient_user_name_idx',
+                include=('measurement_unit', 'amount',),
+            ),)
+
+    def __str__(self) -> str:
+        return f'{self.name} в списке покупок {self.user}.'
+
+
+class RecipeSimilarity(models.Model):
+    """Похожий рецепт, рассчитанный командой build_recommendations."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт',)
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',)
+    score = models.FloatField(verbose_name='Сходство',)
+    computed_at = models.DateTimeField(
+        verbose_name='Дата расчёта',
+        default=timezone.now,
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar',),
+                name='unique_recipe_similarity',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score',),
+                name='recipe_similarity_score_idx',
+                include=('similar',),
+            ),
+            models.Index(
+                fields=('computed_at',),
+                name='recipe_similarity_time_idx',
+            ),)
+
+    def __str__(self) -> str:
+        return f'{self.similar} похож на {self.recipe}.'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя (fan-out on write)."""
+
+    user = models.ForeignKey(
+        MyUser,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',)
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',)
+    author = models.ForeignKey(
+        MyUser,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',)
+    pub_date = models.DateTimeField(verbose_name='Дата публикации',)
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe',),
+                name='unique_feed_entry',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe',),
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author',),
+                name='feed_user_author_idx',
+            ),)
+
+    def __str__(self) -> str:
+        return f'{self.recipe} в ленте {self.user}.'
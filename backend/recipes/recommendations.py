@@ -0,0 +1,235 @@
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from scipy import sparse
+
+from foodgram.settings import (RECOMMENDATION_BLOCK_SIZE,
+                               RECOMMENDATION_CART_WEIGHT,
+                               RECOMMENDATION_CO_WEIGHT,
+                               RECOMMENDATION_INGREDIENT_WEIGHT,
+                               RECOMMENDATION_MAX_INGREDIENT_SHARE,
+                               RECOMMENDATION_NEIGHBOURS,
+                               RECOMMENDATION_TAG_WEIGHT)
+
+from .importers import Dataset, copy_rows, insert_rows
+from .models import (FavoriteRecipe, IngredientRecipe, Recipe,
+                     RecipeSimilarity, ShoppingCart, TagRecipe)
+
+SIMILARITIES = Dataset(
+    RecipeSimilarity, ('recipe_id', 'similar_id', 'score', 'computed_at'),
+    ('recipe_id', 'similar_id'))
+# Сколько кандидатов на одного соседа переоценивается с учётом тегов.
+CANDIDATES_PER_NEIGHBOUR = 5
+
+
+def normalize_rows(matrix):
+    """Делит строки на их длину: произведение строк становится косинусом."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def top_per_row(rows, columns, scores, limit):
+    """Оставляет limit лучших значений в каждой строке."""
+    order = np.lexsort((-scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < limit
+    return rows[keep], columns[keep], scores[keep]
+
+
+class SimilarityModel:
+    """Матрицы рецептов для расчёта сходства «рецепт — рецепт».
+
+    Строка каждой матрицы — рецепт, строки нормированы, поэтому
+    произведение блока строк на транспонированную матрицу даёт косинусы
+    сразу для блока рецептов против всех остальных:
+
+    - избранное и корзины пользователей (совместные добавления);
+    - ингредиенты с весом idf, самые частые (соль, вода) отброшены;
+    - теги. Они есть почти у всех рецептов и только уточняют оценку
+      лучших кандидатов, найденных по первым двум матрицам.
+    """
+
+    def __init__(self):
+        self.recipe_ids = np.array(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True),
+            dtype=np.int64)
+        recipe_ids, user_ids, weights = [], [], []
+        for model, weight in (
+            (FavoriteRecipe, 1.0), (ShoppingCart, RECOMMENDATION_CART_WEIGHT)
+        ):
+            for recipe_id, user_id in model.objects.values_list(
+                'recipe_id', 'user_id'
+            ).iterator():
+                recipe_ids.append(recipe_id)
+                user_ids.append(user_id)
+                weights.append(weight)
+        self.users = self.matrix(recipe_ids, user_ids, weights)
+        self.ingredients = self.idf(self.matrix(*self.links(
+            IngredientRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id'))))
+        self.tags = self.matrix(*self.links(
+            TagRecipe.objects.values_list('recipe_id', 'tag_id')))
+
+    @staticmethod
+    def links(pairs):
+        recipe_ids, columns = [], []
+        for recipe_id, column in pairs.iterator():
+            recipe_ids.append(recipe_id)
+            columns.append(column)
+        return recipe_ids, columns, np.ones(len(recipe_ids))
+
+    def positions(self, recipe_ids):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if not self.recipe_ids.size:
+            return recipe_ids, np.zeros(recipe_ids.shape, dtype=bool)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        positions[positions == len(self.recipe_ids)] = 0
+        found = self.recipe_ids[positions] == recipe_ids
+        return positions, found
+
+    def matrix(self, recipe_ids, columns, weights):
+        """Разреженная матрица рецептов; неизвестные рецепты пропускаются."""
+        positions, found = self.positions(recipe_ids)
+        columns = np.unique(
+            np.asarray(columns, dtype=np.int64), return_inverse=True)[1]
+        matrix = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float64)[found],
+             (positions[found], columns.reshape(-1)[found])),
+            shape=(len(self.recipe_ids), int(columns.max(initial=-1)) + 1))
+        matrix.sum_duplicates()
+        return matrix
+
+    def idf(self, matrix):
+        recipes = max(len(self.recipe_ids), 1)
+        frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        weights = np.log(recipes / np.maximum(frequency, 1))
+        weights[frequency > recipes * RECOMMENDATION_MAX_INGREDIENT_SHARE] = 0
+        return matrix.dot(sparse.diags(weights)).tocsr()
+
+    @staticmethod
+    def candidates(scores, size):
+        """Не больше size лучших кандидатов в каждой строке scores.
+
+        argpartition по строке вместо сортировки всех пар блока: у
+        популярных рецептов кандидатов десятки тысяч.
+        """
+        rows, columns, values = [], [], []
+        for row in range(scores.shape[0]):
+            found = slice(scores.indptr[row], scores.indptr[row + 1])
+            row_columns, row_values = scores.indices[found], scores.data[found]
+            if len(row_values) > size:
+                best = np.argpartition(-row_values, size)[:size]
+                row_columns, row_values = row_columns[best], row_values[best]
+            rows.append(np.full(len(row_values), row))
+            columns.append(row_columns)
+            values.append(row_values)
+        return (
+            np.concatenate(rows), np.concatenate(columns),
+            np.concatenate(values))
+
+    def neighbours(self, positions, limit=RECOMMENDATION_NEIGHBOURS,
+                   block_size=RECOMMENDATION_BLOCK_SIZE):
+        """Отдаёт (recipe_id, [(similar_id, score), ...]) по блокам."""
+        users = normalize_rows(self.users)
+        ingredients = normalize_rows(self.ingredients)
+        tags = normalize_rows(self.tags)
+        for start in range(0, len(positions), block_size):
+            block = positions[start:start + block_size]
+            scores = (
+                RECOMMENDATION_CO_WEIGHT * users[block].dot(users.T)
+                + RECOMMENDATION_INGREDIENT_WEIGHT
+                * ingredients[block].dot(ingredients.T)
+            ).tocsr()
+            rows, columns, values = self.candidates(
+                scores, limit * CANDIDATES_PER_NEIGHBOUR)
+            values = values + RECOMMENDATION_TAG_WEIGHT * np.asarray(
+                tags[block[rows]].multiply(tags[columns]).sum(axis=1)
+            ).ravel()
+            keep = (block[rows] != columns) & (values > 0)
+            rows, columns, values = top_per_row(
+                rows[keep], columns[keep], values[keep], limit)
+            bounds = np.searchsorted(rows, np.arange(len(block) + 1))
+            for row, position in enumerate(block):
+                found = slice(bounds[row], bounds[row + 1])
+                yield int(self.recipe_ids[position]), list(zip(
+                    self.recipe_ids[columns[found]].tolist(),
+                    values[found].round(6).tolist()))
+
+
+def changed_recipes(since):
+    """Рецепты, чьё сходство могло измениться после since.
+
+    Изменённые рецепты, рецепты с новыми добавлениями в избранное или
+    корзину и все рецепты тех же пользователей: у них появился новый
+    общий рецепт. Удаления не отслеживаются, их учтёт полная сборка.
+    """
+    changed = set(
+        Recipe.objects.filter(updated_at__gt=since).values_list(
+            'pk', flat=True))
+    for model in (FavoriteRecipe, ShoppingCart):
+        users = model.objects.filter(created_at__gt=since).values('user_id')
+        for source in (FavoriteRecipe, ShoppingCart):
+            changed.update(source.objects.filter(
+                user__in=users).values_list('recipe_id', flat=True))
+    return changed
+
+
+def build_recommendations(full=False, block_size=RECOMMENDATION_BLOCK_SIZE,
+                          progress=None):
+    """Пересчитывает RecipeSimilarity, возвращает число рецептов.
+
+    Без full пересчитываются только рецепты из changed_recipes с
+    момента прошлой сборки; первая сборка всегда полная.
+    """
+    computed_at = timezone.now()
+    since = None if full else RecipeSimilarity.objects.aggregate(
+        last=Max('computed_at'))['last']
+    model = SimilarityModel()
+    if since is None:
+        positions = np.arange(len(model.recipe_ids))
+    else:
+        positions, found = model.positions(sorted(changed_recipes(since)))
+        positions = positions[found]
+    done = 0
+    batch = {}
+    for recipe_id, similar in model.neighbours(
+        positions, block_size=block_size
+    ):
+        batch[recipe_id] = similar
+        if len(batch) == block_size:
+            save_similarities(batch, computed_at)
+            done += len(batch)
+            batch = {}
+            if progress:
+                progress(done)
+    if batch:
+        save_similarities(batch, computed_at)
+        done += len(batch)
+    return done
+
+
+def save_similarities(batch, computed_at):
+    """Заменяет соседей рецептов из batch.
+
+    Как и импорт, пишет через COPY или executemany: на миллионе строк
+    создание моделей для bulk_create дольше самого расчёта.
+    """
+    computed_at = connection.ops.adapt_datetimefield_value(computed_at)
+    rows = (
+        {'recipe_id': recipe_id, 'similar_id': similar_id, 'score': score,
+         'computed_at': computed_at}
+        for recipe_id, similar in batch.items()
+        for similar_id, score in similar
+    )
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe__in=list(batch)).delete()
+        if connection.vendor == 'postgresql':
+            copy_rows(SIMILARITIES, rows, update=False)
+        elif connection.vendor == 'sqlite':
+            insert_rows(SIMILARITIES, rows, update=False, batch_size=5000)
+        else:
+            RecipeSimilarity.objects.bulk_create(
+                (RecipeSimilarity(**row) for row in rows), batch_size=1000)
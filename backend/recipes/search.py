@@ -0,0 +1,209 @@
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+
+from foodgram.settings import SEARCH_CONFIG, SEARCH_FALLBACK_LIMIT
+
+from .models import IngredientRecipe, Recipe
+
+TOKEN = re.compile(r'\w+')
+# Веса полей как у setweight: название A, ингредиенты B, описание C.
+FIELD_WEIGHTS = (('name', 1.0), ('ingredients', 0.4), ('text', 0.1))
+REINDEX_BATCH_SIZE = 5000
+
+UPDATE_SEARCH_VECTOR = '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector(%(config)s::regconfig, recipe.name), 'A')
+        || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%(config)s::regconfig, recipe.text), 'C')
+    WHERE recipe.id = ANY(%(ids)s)
+'''
+
+
+def tokenize(text):
+    return TOKEN.findall((text or '').lower().replace('ё', 'е'))
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов в памяти для баз без tsvector.
+
+    Слово запроса совпадает со словами индекса, которые с него
+    начинаются, вместо стемминга PostgreSQL. Найдены должны быть все
+    слова запроса, оценка складывается из веса поля и редкости слова.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = None
+        self.documents = {}
+        self._terms = None
+
+    @property
+    def ready(self):
+        return self.postings is not None
+
+    def build(self):
+        with self._lock:
+            if self.ready:
+                return
+            self.postings = defaultdict(dict)
+            self.documents = {}
+            self._index(Recipe.objects.all())
+
+    def refresh(self, recipe_ids):
+        """Переиндексирует рецепты; удалённые просто исчезают."""
+        if not self.ready:
+            return
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+            self._index(Recipe.objects.filter(pk__in=recipe_ids))
+
+    def remove(self, recipe_id):
+        if self.ready:
+            with self._lock:
+                self._remove(recipe_id)
+
+    def _index(self, recipes):
+        recipes = {
+            pk: (name, text)
+            for pk, name, text in recipes.values_list('pk', 'name', 'text')
+        }
+        ingredients = defaultdict(list)
+        for recipe_id, name in IngredientRecipe.objects.filter(
+            recipe__in=list(recipes)
+        ).values_list('recipe_id', 'ingredient__name'):
+            ingredients[recipe_id].append(name)
+        for pk, (name, text) in recipes.items():
+            fields = {
+                'name': name,
+                'ingredients': ' '.join(ingredients[pk]),
+                'text': text,
+            }
+            weights = {}
+            for field, weight in FIELD_WEIGHTS:
+                for term in tokenize(fields[field]):
+                    weights[term] = max(weights.get(term, 0), weight)
+            for term, weight in weights.items():
+                self.postings[term][pk] = weight
+            self.documents[pk] = tuple(weights)
+        self._terms = None
+
+    def _remove(self, recipe_id):
+        for term in self.documents.pop(recipe_id, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(recipe_id, None)
+                if not postings:
+                    del self.postings[term]
+        self._terms = None
+
+    def _matches(self, token, terms):
+        scores = {}
+        start = bisect_left(terms, token)
+        end = bisect_left(terms, token + '\uffff', start)
+        for term in terms[start:end]:
+            postings = self.postings[term]
+            idf = math.log(1 + len(self.documents) / len(postings))
+            for recipe_id, weight in postings.items():
+                scores[recipe_id] = max(
+                    scores.get(recipe_id, 0), weight * idf)
+        return scores
+
+    def search(self, query):
+        """Список (id, оценка) по убыванию оценки."""
+        self.build()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            if self._terms is None:
+                self._terms = sorted(self.postings)
+            terms = self._terms
+            found = None
+            for token in dict.fromkeys(tokens):
+                matches = self._matches(token, terms)
+                if found is None:
+                    found = matches
+                else:
+                    found = {
+                        recipe_id: score + matches[recipe_id]
+                        for recipe_id, score in found.items()
+                        if recipe_id in matches
+                    }
+                if not found:
+                    return []
+        return sorted(found.items(), key=lambda item: (-item[1], -item[0]))
+
+
+search_index = RecipeSearchIndex()
+
+
+def uses_search_vector():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_index(recipe_ids=None):
+    """Обновляет search_vector или индекс в памяти для рецептов.
+
+    Вызывается после сохранения ингредиентов рецепта: они входят в
+    индекс. Без recipe_ids переиндексируются все рецепты пачками.
+    """
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.order_by('pk').values_list(
+            'pk', flat=True)
+    recipe_ids = list(recipe_ids)
+    if not uses_search_vector():
+        search_index.refresh(recipe_ids)
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), REINDEX_BATCH_SIZE):
+            cursor.execute(UPDATE_SEARCH_VECTOR, {
+                'config': SEARCH_CONFIG,
+                'ids': recipe_ids[start:start + REINDEX_BATCH_SIZE],
+            })
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности (rank).
+
+    Без tsvector найденные id попадают в запрос списком, поэтому остаются
+    только SEARCH_FALLBACK_LIMIT лучших из подходящих под остальные
+    фильтры queryset; count пагинации считает только их.
+    """
+    if uses_search_vector():
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+        ).order_by('-rank', '-id')
+    ranked = search_index.search(query)
+    if len(ranked) > SEARCH_FALLBACK_LIMIT:
+        allowed = set(queryset.values_list('pk', flat=True))
+        ranked = [item for item in ranked if item[0] in allowed]
+    # Оценок немного разных: одна ветка CASE на оценку, а не на рецепт.
+    by_score = defaultdict(list)
+    for pk, score in ranked[:SEARCH_FALLBACK_LIMIT]:
+        by_score[score].append(pk)
+    return queryset.filter(
+        pk__in=[pk for pks in by_score.values() for pk in pks]
+    ).annotate(
+        rank=Case(
+            *(When(pk__in=pks, then=Value(score))
+              for score, pks in by_score.items()),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    ).order_by('-rank', '-id')
@@ -0,0 +1,254 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (Case, Count, F, IntegerField, OuterRef, Subquery,
+                              Sum, Value, When)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from foodgram.settings import (RECOMMENDATION_NEIGHBOURS,
+                               RECOMMENDATION_SEED_LIMIT, TRENDING_CART_WEIGHT,
+                               TRENDING_FAVORITE_WEIGHT,
+                               TRENDING_HALF_LIFE_HOURS, TRENDING_WINDOW_DAYS)
+
+from .models import (FavoriteRecipe, Ingredient, IngredientRecipe, MyUser,
+                     Recipe, RecipeSimilarity, ShoppingCart,
+                     ShoppingCartIngredient, SubscriptionUser)
+from .search import update_search_index
+
+# Модель-источник: (модель со счётчиком, поле связи, поле счётчика).
+COUNTERS = {
+    FavoriteRecipe: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingCart: (Recipe, 'recipe_id', 'in_carts_count'),
+    SubscriptionUser: (MyUser, 'author_id', 'followers_count'),
+    Recipe: (MyUser, 'author_id', 'recipes_count'),
+}
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(
+        IngredientRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def apply_cart_delta(user_ids, amounts):
+    """Изменяет суммы ингредиентов в списках покупок пользователей."""
+    amounts = {
+        ingredient_id: amount
+        for ingredient_id, amount in amounts.items() if amount
+    }
+    user_ids = list(user_ids)
+    if not user_ids or not amounts:
+        return
+    totals = ShoppingCartIngredient.objects.filter(
+        user__in=user_ids, ingredient__in=amounts)
+    with transaction.atomic():
+        existing = set(totals.values_list('user_id', 'ingredient_id'))
+        missing = [
+            (user_id, ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, amount in amounts.items()
+            if amount > 0 and (user_id, ingredient_id) not in existing
+        ]
+        if missing:
+            # Строки создаются с нулём: если параллельный запрос успел
+            # вставить ту же пару, вставка пропускается, а количество
+            # в обоих случаях добавляет UPDATE ниже.
+            ingredients = Ingredient.objects.in_bulk(
+                {ingredient_id for _, ingredient_id in missing})
+            ShoppingCartIngredient.objects.bulk_create((
+                ShoppingCartIngredient(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    name=ingredients[ingredient_id].name,
+                    measurement_unit=(
+                        ingredients[ingredient_id].measurement_unit),
+                    amount=0,
+                )
+                for user_id, ingredient_id in missing
+            ), ignore_conflicts=True)
+        totals.update(amount=F('amount') + Case(
+            *(When(ingredient_id=ingredient_id, then=Value(amount))
+              for ingredient_id, amount in amounts.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        totals.filter(amount__lte=0).delete()
+
+
+def add_recipe_to_cart_totals(user_id, recipe_id):
+    apply_cart_delta([user_id], get_recipe_amounts(recipe_id))
+
+
+def remove_recipe_from_cart_totals(user_id, recipe_id):
+    apply_cart_delta([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def update_recipe_cart_totals(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение состава рецепта в списки покупок."""
+    delta = {
+        ingredient_id: (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in {*old_amounts, *new_amounts}
+    }
+    apply_cart_delta(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True),
+        delta,
+    )
+
+
+def refresh_ingredient_copies(ingredient_ids):
+    """Переносит название и единицу ингредиентов в их копии.
+
+    Копии лежат в строках списков покупок и в поисковых векторах
+    рецептов. Вызывается сигналом Ingredient и пакетным импортом, который
+    сигналы не отправляет.
+    """
+    ingredient_ids = list(ingredient_ids)
+    if not ingredient_ids:
+        return
+    source = Ingredient.objects.filter(pk=OuterRef('ingredient_id'))
+    ShoppingCartIngredient.objects.filter(
+        ingredient__in=ingredient_ids
+    ).update(
+        name=Subquery(source.values('name')[:1]),
+        measurement_unit=Subquery(source.values('measurement_unit')[:1]),
+    )
+    update_search_index(
+        IngredientRecipe.objects.filter(
+            ingredient__in=ingredient_ids
+        ).order_by().values_list('recipe_id', flat=True).distinct())
+
+
+def get_live_cart_totals(user_ids=None):
+    """Считает суммы ингредиентов списков покупок заново по рецептам."""
+    # Одно условие на связь: второй filter() по cart_recipe добавил бы
+    # ещё один JOIN и умножил строки на число рецептов в корзине.
+    if user_ids is None:
+        condition = {'recipe__cart_recipe__isnull': False}
+    else:
+        condition = {'recipe__cart_recipe__user__in': user_ids}
+    return IngredientRecipe.objects.filter(**condition).values(
+        'recipe__cart_recipe__user', 'ingredient',
+        'ingredient__name', 'ingredient__measurement_unit',
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def change_counter(source, pk, delta):
+    """Сдвигает счётчик через F(), параллельные записи не теряются."""
+    model, _, field = COUNTERS[source]
+    value = F(field) + delta
+    if delta < 0:
+        # Разошедшийся счётчик не должен нарушать ограничение >= 0.
+        value = Greatest(value, 0)
+    model.objects.filter(pk=pk).update(**{field: value})
+
+
+def count_subquery(source):
+    _, link, _ = COUNTERS[source]
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{link: OuterRef('pk')}).order_by()
+            .values(link).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def reconcile_counter(source, fix=True):
+    """Находит и исправляет записи, где счётчик разошёлся с данными.
+
+    Возвращает список (pk, значение в столбце, фактическое значение).
+    """
+    model, _, field = COUNTERS[source]
+    drifted = model.objects.annotate(
+        actual=count_subquery(source)).exclude(**{field: F('actual')})
+    rows = list(drifted.values_list('pk', field, 'actual'))
+    if fix and rows:
+        model.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+            **{field: count_subquery(source)})
+    return rows
+
+
+def get_trending_scores(now=None):
+    """Сумма добавлений в избранное и корзину с затуханием по времени.
+
+    Вклад добавления уменьшается вдвое каждые TRENDING_HALF_LIFE_HOURS,
+    добавления старше TRENDING_WINDOW_DAYS не учитываются.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+    half_life = TRENDING_HALF_LIFE_HOURS * 60 * 60
+    scores = defaultdict(float)
+    for model, weight in (
+        (FavoriteRecipe, TRENDING_FAVORITE_WEIGHT),
+        (ShoppingCart, TRENDING_CART_WEIGHT),
+    ):
+        for recipe_id, created_at in model.objects.filter(
+            created_at__gte=since
+        ).values_list('recipe_id', 'created_at').iterator():
+            age = max((now - created_at).total_seconds(), 0)
+            scores[recipe_id] += weight * 0.5 ** (age / half_life)
+    return {
+        recipe_id: round(score, 6) for recipe_id, score in scores.items()}
+
+
+def refresh_trending_scores(now=None):
+    """Записывает Recipe.trending_score, меняя только изменившиеся строки."""
+    scores = get_trending_scores(now)
+    with transaction.atomic():
+        current = dict(
+            Recipe.objects.exclude(trending_score=0).values_list(
+                'pk', 'trending_score'))
+        changed = [
+            Recipe(pk=pk, trending_score=scores.get(pk, 0))
+            for pk in current.keys() | scores.keys()
+            if current.get(pk, 0) != scores.get(pk, 0)
+        ]
+        Recipe.objects.bulk_update(
+            changed, ('trending_score',), batch_size=1000)
+    return len(changed)
+
+
+def get_similar_recipes(recipe_id, limit=RECOMMENDATION_NEIGHBOURS):
+    """Похожие рецепты из RecipeSimilarity по убыванию сходства."""
+    return [
+        row.similar for row in RecipeSimilarity.objects.filter(
+            recipe_id=recipe_id
+        ).select_related('similar').order_by('-score', '-similar_id')[:limit]
+    ]
+
+
+def get_recommended_recipes(user, limit=RECOMMENDATION_NEIGHBOURS):
+    """Рецепты, похожие на недавно добавленные в избранное и корзину.
+
+    Сходство соседей суммируется по всем таким рецептам, уже добавленные
+    рецепты не предлагаются. Пока добавлений нет, отдаются популярные.
+    """
+    seeds, seen = set(), set()
+    for model in (FavoriteRecipe, ShoppingCart):
+        added = model.objects.filter(user=user)
+        seeds.update(added.order_by('-created_at').values_list(
+            'recipe_id', flat=True)[:RECOMMENDATION_SEED_LIMIT])
+        seen.update(added.values_list('recipe_id', flat=True))
+    ranked = list(
+        RecipeSimilarity.objects.filter(recipe__in=seeds).exclude(
+            similar__in=seen
+        ).values('similar').annotate(
+            total=Sum('score')
+        ).order_by('-total', '-similar').values_list(
+            'similar', flat=True)[:limit]
+    )
+    if not ranked:
+        return list(Recipe.objects.exclude(pk__in=seen).order_by(
+            '-favorites_count', '-id')[:limit])
+    recipes = Recipe.objects.in_bulk(ranked)
+    return [recipes[pk] for pk in ranked if pk in recipes]
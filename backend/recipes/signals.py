@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .feeds import (add_author_to_feed, fan_out_recipes,
+                    remove_author_from_feed, switch_fan_out)
+from .models import Ingredient, MyUser, Recipe, ShoppingCart, SubscriptionUser
+from .search import search_index
+from .services import (COUNTERS, add_recipe_to_cart_totals, change_counter,
+                       refresh_ingredient_copies,
+                       remove_recipe_from_cart_totals)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_cart_totals(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_cart_totals(sender, instance, **kwargs):
+    remove_recipe_from_cart_totals(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def rename_cart_totals(sender, instance, created, **kwargs):
+    if not created:
+        refresh_ingredient_copies([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, **kwargs):
+    search_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_recipes([instance.pk])
+
+
+@receiver(post_save, sender=SubscriptionUser)
+def add_author_recipes_to_feed(sender, instance, created, raw=False,
+                               **kwargs):
+    if created and not raw:
+        add_author_to_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=SubscriptionUser)
+def remove_author_recipes_from_feed(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+def increment_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(sender, getattr(instance, COUNTERS[sender][1]), 1)
+
+
+def decrement_counter(sender, instance, **kwargs):
+    change_counter(sender, getattr(instance, COUNTERS[sender][1]), -1)
+
+
+for source in COUNTERS:
+    post_save.connect(increment_counter, sender=source)
+    post_delete.connect(decrement_counter, sender=source)
+
+
+def switch_author_feed(author_id, delta):
+    followers = MyUser.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True).first()
+    if followers is not None:
+        switch_fan_out(author_id, followers - delta, followers)
+
+
+# Подключены после счётчиков: режим ленты зависит от нового
+# followers_count, прочитанного в той же транзакции.
+@receiver(post_save, sender=SubscriptionUser)
+def switch_feed_on_subscribe(sender, instance, created, raw=False,
+                             **kwargs):
+    if created and not raw:
+        switch_author_feed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=SubscriptionUser)
+def switch_feed_on_unsubscribe(sender, instance, **kwargs):
+    switch_author_feed(instance.author_id, -1)
@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from recipes.models import (Ingredient, IngredientRecipe, MyUser, Recipe,
+                            ShoppingCart, ShoppingCartIngredient)
+from recipes.services import apply_cart_delta, get_live_cart_totals
+
+
+class CartTotalsTests(TestCase):
+    """Суммы списка покупок совпадают с составом рецептов в корзине."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MyUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Покупатель', last_name='Покупатель', password='pass')
+        other = MyUser.objects.create_user(
+            username='other', email='other@example.com',
+            first_name='Другой', last_name='Другой', password='pass')
+        cls.salt, cls.flour = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Соль', 'Мука'))
+        for number, amount in enumerate((10, 20, 30)):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipe_images/test.png')
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=cls.salt, amount=amount)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=other, recipe=recipe)
+
+    def stored(self):
+        return dict(ShoppingCartIngredient.objects.filter(
+            user=self.user).values_list('ingredient_id', 'amount'))
+
+    def test_live_totals_match_stored(self):
+        for user_ids in (None, [self.user.pk]):
+            with self.subTest(user_ids=user_ids):
+                live = {
+                    row['ingredient']: row['total']
+                    for row in get_live_cart_totals(user_ids)
+                    if row['recipe__cart_recipe__user'] == self.user.pk}
+                self.assertEqual(live, {self.salt.pk: 60})
+                self.assertEqual(live, self.stored())
+
+    def test_apply_cart_delta(self):
+        apply_cart_delta([self.user.pk], {self.salt.pk: 5, self.flour.pk: 7})
+        self.assertEqual(
+            self.stored(), {self.salt.pk: 65, self.flour.pk: 7})
+        apply_cart_delta([self.user.pk], {self.flour.pk: -7})
+        self.assertEqual(self.stored(), {self.salt.pk: 65})
@@ -0,0 +1,62 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.feeds import get_feed_page
+from recipes.models import FeedEntry, MyUser, Recipe, SubscriptionUser
+
+
+@mock.patch('recipes.feeds.FEED_FANOUT_MAX_FOLLOWERS', 2)
+class FanOutThresholdTests(TestCase):
+    """Лента не теряет и не повторяет рецепты при переходе порога."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, *cls.readers = [
+            MyUser.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com',
+                first_name='Пользователь', last_name=str(number),
+                password='pass')
+            for number in range(4)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Текст', cooking_time=10,
+            image='recipe_images/test.png')
+
+    def entries(self):
+        return set(FeedEntry.objects.filter(
+            author=self.author).values_list('user_id', flat=True))
+
+    def assert_feeds(self, readers):
+        for reader in self.readers:
+            expected = (
+                [(self.recipe.pub_date, self.recipe.pk)]
+                if reader in readers else [])
+            self.assertEqual(get_feed_page(reader, limit=10), expected)
+
+    def subscribe(self, reader):
+        SubscriptionUser.objects.create(user=reader, author=self.author)
+
+    def test_crossing(self):
+        first, second, third = self.readers
+        self.subscribe(first)
+        self.subscribe(second)
+        self.assertEqual(self.entries(), {first.pk, second.pk})
+        # Третий подписчик переводит автора на чтение из Recipe.
+        self.subscribe(third)
+        self.assertEqual(self.entries(), set())
+        self.assert_feeds({first, second, third})
+        # После отписки записи появляются у всех, включая третьего.
+        SubscriptionUser.objects.get(user=first, author=self.author).delete()
+        self.assertEqual(self.entries(), {second.pk, third.pk})
+        self.assert_feeds({second, third})
+
+    def test_reconcile_counters(self):
+        first = self.readers[0]
+        # Счётчик разошёлся выше порога: подписка не попала в ленту.
+        MyUser.objects.filter(pk=self.author.pk).update(followers_count=5)
+        self.subscribe(first)
+        self.assertEqual(self.entries(), set())
+        call_command('reconcile_counters', stdout=io.StringIO())
+        self.assertEqual(self.entries(), {first.pk})
@@ -0,0 +1,52 @@
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.cache import get_version
+from recipes.models import MyUser, Recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class GenerateImageVariantsTests(TestCase):
+    """Заполнение копий сбрасывает кеш рецептов и пользователей."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'green').save(buffer, format='PNG')
+        name = default_storage.save(
+            'recipe_images/old.png', ContentFile(buffer.getvalue()))
+        author = MyUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Автор', password='pass',
+            avatar=name)
+        self.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Текст', cooking_time=10,
+            image=name)
+        Recipe.objects.update(image_variants={})
+        MyUser.objects.update(avatar_variants={})
+
+    def test_versions_bumped(self):
+        before = {
+            namespace: get_version(namespace)
+            for namespace in ('recipes', 'users')}
+        call_command(
+            'generate_image_variants', workers=1, stdout=io.StringIO())
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image_variants)
+        for namespace, version in before.items():
+            self.assertNotEqual(get_version(namespace), version, namespace)
@@ -0,0 +1,52 @@
+import os
+import signal
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import ImageProcessingUnavailable, ProcessedImageField
+from recipes import images
+
+
+class BrokenPoolTests(SimpleTestCase):
+    """Пул с убитым процессом заменяется новым."""
+
+    def setUp(self):
+        file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
+        with file:
+            Image.new('RGB', (4, 4), 'red').save(file, format='PNG')
+        self.path = file.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_retry_after_killed_worker(self):
+        images.run_process_image(self.path)
+        broken = images.get_executor()
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        original, variants = images.run_process_image(self.path)
+        self.assertEqual(original[1:], (4, 4))
+        self.assertIsNot(images.get_executor(), broken)
+
+    def test_unavailable_after_second_failure(self):
+        with mock.patch.object(
+            images, 'submit_process_image', side_effect=BrokenProcessPool
+        ) as submit:
+            with self.assertRaises(BrokenProcessPool):
+                images.run_process_image(self.path)
+        self.assertEqual(submit.call_count, 2)
+        field = ProcessedImageField(upload_to='recipe_images')
+        with mock.patch(
+            'api.fields.save_base64_image', side_effect=BrokenProcessPool
+        ):
+            with self.assertRaises(ImageProcessingUnavailable):
+                field.to_internal_value('aGVsbG8=')
+
+    def test_invalid_image(self):
+        field = ProcessedImageField(upload_to='recipe_images')
+        with self.assertRaises(ValidationError):
+            field.to_internal_value('aGVsbG8=')
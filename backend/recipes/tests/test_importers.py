@@ -0,0 +1,75 @@
+from django.test import TestCase, TransactionTestCase
+
+from recipes.importers import DATASETS, bulk_rows, import_recipes, import_rows
+from recipes.models import (Ingredient, IngredientRecipe, MyUser, Recipe,
+                            ShoppingCart, ShoppingCartIngredient, Tag)
+
+
+class ImportUpdateTests(TestCase):
+    """Импорт с --update обновляет копии ингредиента в списках покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = MyUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Покупатель', last_name='Покупатель', password='pass')
+        cls.salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipe_images/test.png')
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=cls.salt, amount=10)
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def cart_unit(self):
+        return ShoppingCartIngredient.objects.get(
+            ingredient=self.salt).measurement_unit
+
+    def test_import_rows(self):
+        records = [{'name': 'Соль', 'measurement_unit': 'кг'}]
+        import_rows(DATASETS['ingredients'], records, update=True)
+        self.assertEqual(self.cart_unit(), 'кг')
+        # Повторный импорт тех же данных ничего не перезаписывает.
+        _, changed = import_rows(
+            DATASETS['ingredients'], records, update=True)
+        self.assertIn(changed, (0, None))
+
+    def test_bulk_rows(self):
+        rows = [{'name': 'Соль', 'measurement_unit': 'кг'}]
+        bulk_rows(DATASETS['ingredients'], rows, True, 100)
+        self.assertEqual(self.cart_unit(), 'кг')
+
+
+class OverlappingRecipeImportTests(TransactionTestCase):
+    """Пачки с одинаковыми рецептами в разных потоках не создают дубликатов.
+
+    TransactionTestCase: пачки пишутся в своих соединениях и транзакциях.
+    """
+
+    def test_overlapping_chunks(self):
+        authors = [
+            MyUser.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name='Автор', password='pass')
+            for number in range(2)]
+        Tag.objects.create(name='Ужин', slug='dinner')
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        records = [
+            {
+                'author': authors[number % 2].username,
+                'name': f'Рецепт {number % 6}',
+                'text': 'Текст',
+                'cooking_time': 10,
+                'image': 'recipe_images/test.png',
+                'tags': ['dinner'],
+                'ingredients': [{'name': 'Соль', 'amount': 5}],
+            }
+            for number in range(48)]
+        # Каждая пачка из трёх записей повторяет рецепты других пачек.
+        processed, created = import_recipes(records, batch_size=3, workers=4)
+        self.assertEqual((processed, created), (48, 6))
+        self.assertEqual(Recipe.objects.count(), 6)
+        for author in authors:
+            author.refresh_from_db()
+            self.assertEqual(author.recipes_count, 3)
@@ -0,0 +1,92 @@
+from unittest import mock, skipIf
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, MyUser, Recipe
+from recipes.search import RecipeSearchIndex, search_recipes
+
+
+@mock.patch('recipes.search.SEARCH_FALLBACK_LIMIT', 2)
+@mock.patch('recipes.search.uses_search_vector', lambda: False)
+class FallbackSearchTests(TestCase):
+    """Поиск без tsvector ограничивает выдачу после остальных фильтров."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            MyUser.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name='Автор', password='pass')
+            for number in range(2)]
+        # Рецепты второго автора созданы позже и при равной оценке выше.
+        for author in cls.authors:
+            for number in range(3):
+                Recipe.objects.create(
+                    author=author, name=f'Борщ {number}', text='Текст',
+                    cooking_time=10, image='recipe_images/test.png')
+
+    def setUp(self):
+        patcher = mock.patch(
+            'recipes.search.search_index', RecipeSearchIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_limit(self):
+        queryset = search_recipes(Recipe.objects.all(), 'борщ')
+        self.assertEqual(queryset.count(), 2)
+
+    def test_limit_applies_after_filters(self):
+        author = self.authors[0]
+        queryset = search_recipes(
+            Recipe.objects.filter(author=author), 'борщ')
+        self.assertEqual(queryset.count(), 2)
+        self.assertEqual({recipe.author for recipe in queryset}, {author})
+
+
+@skipIf(connection.vendor == 'postgresql',
+        'Запасной поиск проверяется на базе без tsvector: DB_ENGINE=sqlite.')
+class SqliteSearchTests(TestCase):
+    """Поиск через API на базе без tsvector идёт по индексу в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = MyUser.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Повар', password='pass')
+        beet = Ingredient.objects.create(name='Свёкла', measurement_unit='г')
+        cls.borsch = Recipe.objects.create(
+            author=author, name='Борщ', text='Суп со сметаной',
+            cooking_time=60, image='recipe_images/test.png')
+        IngredientRecipe.objects.create(
+            recipe=cls.borsch, ingredient=beet, amount=300)
+        cls.salad = Recipe.objects.create(
+            author=author, name='Винегрет', text='Салат как борщ',
+            cooking_time=20, image='recipe_images/test.png')
+        IngredientRecipe.objects.create(
+            recipe=cls.salad, ingredient=beet, amount=100)
+
+    def setUp(self):
+        patcher = mock.patch(
+            'recipes.search.search_index', RecipeSearchIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, query):
+        response = APIClient().get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_search(self):
+        # Название весит больше описания, ингредиенты ищутся по префиксу.
+        self.assertEqual(self.search('борщ'), [self.borsch.pk, self.salad.pk])
+        self.assertEqual(self.search('свекл'), [self.salad.pk, self.borsch.pk])
+        self.assertEqual(self.search('свекла салат'), [self.salad.pk])
+        self.assertEqual(self.search('пельмени'), [])
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.search('борщ'), [self.borsch.pk, self.salad.pk])
+        self.salad.delete()
+        self.assertEqual(self.search('борщ'), [self.borsch.pk])